@@ -1,6 +1,7 @@
 """Aproximation algorithms for bin packing problem."""
 
 from abc import ABC, abstractmethod
+from typing import Iterable
 
 import bpp
 
@@ -14,25 +15,35 @@ class Algorithm(ABC):
         self.instance = instance
 
         # Initialize empty solution
-        self.solution = bpp.BPSolution(instance.bin_size)
+        self.solution = bpp.BPSolution(instance.bin_size, instance.items)
 
-    @abstractmethod
     def solve(self) -> bpp.BPSolution:
-        pass
+        for item_id in self.item_order():
+            self.pack(item_id)
+        self.solution.remove_empty_bins()   # Only the first one, when there are no items
+        return self.solution
+
+    def item_order(self) -> Iterable[int]:
+        """Ids of the items in the order they are packed."""
+        return range(len(self.instance.items))
+
+    @abstractmethod
+    def pack(self, item_id) -> None:
+        """Place one item in the solution."""
 
 
 class AlgorithmDecreasing(Algorithm):
-    def __init__(self, instance: bpp.BPInstance) -> None:
-        super().__init__(instance.sort_decreasing())
+    def item_order(self) -> Iterable[int]:
+        """Ids sorted by decreasing weight, the instance itself is not modified."""
+        items = self.instance.items
+        return sorted(range(len(items)), key=items.__getitem__, reverse=True)
 
 
 class NullAlgorithm(Algorithm):
     """Usefull for testing. Puts each item in a new bin."""
 
-    def solve(self) -> bpp.BPSolution:
-        for item in self.instance:
-            self.solution.pack_in_new_bin(item)
-        return self.solution
+    def pack(self, item_id) -> None:
+        self.solution.pack_in_new_bin(item_id)
 
 
 class NextFitAlgorithm(Algorithm):
@@ -40,29 +51,35 @@ class NextFitAlgorithm(Algorithm):
     it closes it and opens a new bin.
     """
 
-    def solve(self) -> bpp.BPSolution:
-        for item in self.instance:
-            last_bin = self.solution.last_bin
-            if last_bin.fits(item):
-                last_bin.append(item)
-            else:
-                last_bin.closed = True
-                self.solution.pack_in_new_bin(item)
-        return self.solution
+    def pack(self, item_id) -> None:
+        last_bin = self.solution.last_bin
+        if last_bin.fits(self.instance.items[item_id]):
+            self.solution.pack(-1, item_id)
+        else:
+            last_bin.closed = True
+            self.solution.pack_in_new_bin(item_id)
 
 
 class FirstFitAlgorithm(Algorithm):
     """It attempts to place each new item into the first bin in which it fits."""
 
-    def solve(self) -> bpp.BPSolution:
-        for item in self.instance:
-            for bin in self.solution:
-                if bin.fits(item):
-                    bin.append(item)
-                    break
-            else:   # item did not fit in any existing bin
-                self.solution.pack_in_new_bin(item)
-        return self.solution
+    def pack(self, item_id) -> None:
+        bin_index = self.solution.first_fit(self.instance.items[item_id])
+        if bin_index is None:   # item did not fit in any existing bin
+            self.solution.pack_in_new_bin(item_id)
+        else:
+            self.solution.pack(bin_index, item_id)
+
+
+class BestFitAlgorithm(Algorithm):
+    """It places each new item into the bin where it leaves the smallest gap."""
+
+    def pack(self, item_id) -> None:
+        bin_index = self.solution.best_fit(self.instance.items[item_id])
+        if bin_index is None:   # item did not fit in any existing bin
+            self.solution.pack_in_new_bin(item_id)
+        else:
+            self.solution.pack(bin_index, item_id)
 
 
 class FirstFitDecreasingAlgorithm(AlgorithmDecreasing, FirstFitAlgorithm):
@@ -70,3 +87,45 @@ class FirstFitDecreasingAlgorithm(AlgorithmDecreasing, FirstFitAlgorithm):
 
     This class in defined by inheritance.
     """
+
+
+class BestFitDecreasingAlgorithm(AlgorithmDecreasing, BestFitAlgorithm):
+    """Same as best fit, but initial list of items is sorted in decreasing order.
+
+    This class in defined by inheritance.
+    """
+
+
+CONSTRUCTIVE = (
+    FirstFitAlgorithm,
+    BestFitAlgorithm,
+    FirstFitDecreasingAlgorithm,
+    BestFitDecreasingAlgorithm,
+)
+
+
+def solve_all(instance: bpp.BPInstance,
+              algorithms=CONSTRUCTIVE) -> dict[type[Algorithm], bpp.BPSolution]:
+    """Run several algorithms at once.
+    Items are sorted only once and every algorithm sharing an order packs them
+    in the same pass, so all the decreasing variants cost a single traversal.
+    """
+    runs = [algorithm(instance) for algorithm in algorithms]
+
+    passes = {}     # Runs grouped by the item order they follow
+    for run in runs:
+        passes.setdefault(type(run).item_order, []).append(run)
+
+    for group in passes.values():
+        for item_id in group[0].item_order():
+            for run in group:
+                run.pack(item_id)
+
+    for run in runs:
+        run.solution.remove_empty_bins()    # Like solve(), for instances without items
+    return {run.__class__: run.solution for run in runs}
+
+
+def best_solution(instance: bpp.BPInstance, algorithms=CONSTRUCTIVE) -> bpp.BPSolution:
+    """Solution with fewest bins among all algorithms (first one on ties)."""
+    return min(solve_all(instance, algorithms).values(), key=len)
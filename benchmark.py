@@ -0,0 +1,200 @@
+"""Performance benchmark over the instances folder.
+
+Measures raw throughput of the neighbourhood operations and the search quality of each
+VNS variant with a fixed seed, saves them as JSON and compares them with a baseline:
+
+    python benchmark.py --set easy --limit 5 --output bench.json
+    python benchmark.py --set easy --limit 5 --baseline bench.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from math import inf
+from pathlib import Path
+from statistics import median_low
+
+import approximation
+import bpp
+import files
+import logs
+import optimization
+import utils
+import vns
+
+VARIANTS = (
+    (vns.ReducedVNS, None),
+    (vns.BasicVNS, vns.LocalSearchStrategy.BEST),
+    (vns.BasicVNS, vns.LocalSearchStrategy.FIRST),
+    (vns.BasicVNS, vns.LocalSearchStrategy.FIRST_CIRCULAR),
+    (vns.BasicVNS, vns.LocalSearchStrategy.FIRST_RANDOM),
+)
+
+# Higher is better for throughput metrics, lower is better for the rest
+THROUGHPUT = ('moves_per_s', 'batch_moves_per_s', 'shakes_per_s',
+              *(f'ls_iterations_per_s_{strategy.name}' for strategy in vns.LocalSearchStrategy))
+# Describe the instance, not the code being measured
+NOT_COMPARED = ('items', 'lower_bound')
+# Seconds a time to the lower bound can grow on top of the tolerance, short ones are noisy
+TIME_SLACK = 0.1
+
+
+def rate(operation, min_time: float) -> float:
+    """Operations per second. `operation` returns how many operations it did,
+    and is repeated until at least `min_time` seconds have passed."""
+    timer = utils.Timer()
+    timer.start()
+    count = 0
+    while True:
+        count += operation()
+        if timer.elapsed_time >= min_time:
+            return count / timer.elapsed_time
+
+
+def throughput(explorer: optimization.BPSolutionExplorer, k: int, min_time: float) -> dict:
+    metrics = {}
+
+    def evaluate_all():
+        count = 0
+        for move in explorer.possible_moves():
+            explorer.delta_fitness_from_move(move)
+            count += 1
+        return count
+    n_moves = evaluate_all()
+    metrics['moves_per_s'] = rate(evaluate_all, min_time)
+
+    def evaluate_batch():
+        explorer.best_move()
+        return n_moves
+    metrics['batch_moves_per_s'] = rate(evaluate_batch, min_time)
+
+    def shake():
+        explorer.shake(k).rollback()
+        return 1
+    metrics['shakes_per_s'] = rate(shake, min_time)
+
+    for strategy in vns.LocalSearchStrategy:
+        spent, iterations = 0.0, 0
+        while spent < min_time:
+            neighbour = explorer.shake(k)
+            applied = len(neighbour.journal)
+            start = time.perf_counter()
+            local_optimum = neighbour.improve(strategy)
+            spent += time.perf_counter() - start
+            # Every iteration applies one move, except the last one that finds none
+            iterations += len(local_optimum.journal) - applied + 1
+            local_optimum.rollback()
+        metrics[f'ls_iterations_per_s_{strategy.name}'] = iterations / spent
+
+    return metrics
+
+
+def search(instance: bpp.BPInstance, solution: bpp.BPSolution,
+           k_max: int, t_max: float, seed: int, repeats: int = 1) -> dict:
+    """Median over `repeats` runs: runs are bounded by time, so even with the same seed
+    they do not always do the same steps."""
+    metrics = {}
+    for algorithm, strategy in VARIANTS:
+        bins, times = [], []
+        for _ in range(repeats):
+            random.seed(seed)
+            explorer = optimization.BPSolutionExplorer(instance, solution)
+            alg = algorithm(explorer, k_max, t_max, strategy)
+            alg.solve()
+            bins.append(len(alg.explorer.solution))
+            times.append(alg.timer.elapsed_time if alg.explorer.is_optimum else inf)
+        name = f"{algorithm.__name__}_{getattr(strategy, 'name', None)}"
+        metrics[f'bins_{name}'] = median_low(bins)
+        time_to_lb = median_low(times)
+        metrics[f'time_to_lb_{name}'] = time_to_lb if time_to_lb != inf else None
+    return metrics
+
+
+def run(readers, k: int, k_max: int, t_max: float, seed: int, min_time: float,
+        repeats: int = 1) -> dict:
+    results = {}
+    for reader in readers:
+        random.seed(seed)
+        instance = bpp.BPInstance.from_reader(reader)
+        solution = approximation.best_solution(instance)
+        explorer = optimization.BPSolutionExplorer(instance, solution)
+
+        metrics = {'items': len(instance.items), 'lower_bound': instance.lower_bound}
+        metrics |= throughput(explorer, k, min_time)
+        metrics |= search(instance, solution, k_max, t_max, seed, repeats)
+        results[str(reader.path)] = metrics
+        print(f"{reader.path}: " + ", ".join(f"{key}={value:.4g}" for key, value
+                                              in metrics.items() if value is not None))
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float,
+            time_slack: float = TIME_SLACK, t_max: float = inf) -> list[str]:
+    """Regressions of results against baseline, as readable lines.
+    Times to the lower bound get `time_slack` seconds on top of the relative tolerance,
+    and bins one bin, as runs bounded by time (`t_max`) are not exactly reproducible.
+    """
+    regressions = []
+    for instance, metrics in results.items():
+        for key, value in metrics.items():
+            if key in NOT_COMPARED:
+                continue
+            old = baseline.get(instance, {}).get(key)
+            if old is None or value is None:
+                # Not reaching it within t_max is only slower if it was reached well before
+                if (key.startswith('time_to_lb') and old is not None and
+                        old * (1 + tolerance) + time_slack < t_max):
+                    regressions.append(f"{instance}: {key} lower bound no longer reached")
+                continue
+            if key in THROUGHPUT:
+                worse = value < old * (1 - tolerance)
+            elif key.startswith('time_to_lb'):
+                worse = value > old * (1 + tolerance) + time_slack
+            else:
+                worse = value > old + 1
+            if worse:
+                regressions.append(f"{instance}: {key} {old:.4g} -> {value:.4g}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--set', default='easy',
+                        choices=('easy', 'medium', 'hard', 'falkenauer', 'all'))
+    parser.add_argument('--limit', type=int, default=None, help="max number of instances")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--k', type=int, default=10, help="shake size for throughput")
+    parser.add_argument('--k-max', type=int, default=10)
+    parser.add_argument('--t-max', type=float, default=10, help="seconds per VNS run")
+    parser.add_argument('--min-time', type=float, default=0.5,
+                        help="seconds per throughput measurement")
+    parser.add_argument('--output', type=Path, help="save results as JSON")
+    parser.add_argument('--baseline', type=Path, help="JSON results to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="relative slowdown allowed before reporting a regression")
+    parser.add_argument('--time-slack', type=float, default=TIME_SLACK,
+                        help="seconds a time to the lower bound can grow on top of tolerance")
+    parser.add_argument('--repeats', type=int, default=1,
+                        help="VNS runs per variant, their median is reported")
+    args = parser.parse_args()
+
+    logs.silence()     # Logging calls are skipped entirely, as in batch runs
+    readers = sorted(getattr(files.Instances, args.set)(), key=lambda r: r.path)[:args.limit]
+    results = run(readers, args.k, args.k_max, args.t_max, args.seed, args.min_time,
+                  args.repeats)
+
+    if args.output:
+        config = {key: str(value) if isinstance(value, Path) else value
+                  for key, value in vars(args).items()}
+        args.output.write_text(json.dumps({'config': config, 'results': results}, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())['results']
+        regressions = compare(results, baseline, args.tolerance, args.time_slack, args.t_max)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        print(f"{len(regressions)} regressions against {args.baseline}")
+        sys.exit(1 if regressions else 0)
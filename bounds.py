@@ -0,0 +1,86 @@
+"""Lower bounds on the number of bins, from Martello and Toth.
+
+Source:
+Martello1990 - Lower bounds and reduction procedures for the bin packing problem
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from itertools import accumulate
+from math import ceil
+from typing import Iterable
+
+
+def l1(items: Iterable[float], bin_size: float) -> int:
+    """Continuous bound, total weight over bin size."""
+    return ceil(sum(items) / bin_size)
+
+
+def l2(items: Iterable[float], bin_size: float) -> int:
+    """For every threshold a <= bin_size/2, items bigger than bin_size - a need a bin each,
+    as do items bigger than bin_size/2. Items between a and bin_size/2 can only use
+    the space left in the latter, and need new bins for the rest.
+    Only thresholds equal to an item weight are checked, O(n log n).
+    """
+    items = sorted(items)
+    if not items:
+        return 0
+    prefix = [0, *accumulate(items)]      # prefix[i] = sum of the i smallest items
+
+    def weight(low: int, high: int) -> float:
+        return prefix[high] - prefix[low]
+
+    half = bisect_right(items, bin_size / 2)    # items[half:] are bigger than bin_size/2
+    best = 0
+    for a in {0, *items[:half]}:
+        small = bisect_left(items, a)                   # items[small:half] in [a, bin_size/2]
+        big = bisect_right(items, bin_size - a)         # items[big:] bigger than bin_size - a
+        n_medium = big - half
+        space_left = n_medium * bin_size - weight(half, big)
+        overflow = weight(small, half) - space_left
+        best = max(best, len(items) - half + max(0, ceil(overflow / bin_size)))
+    return best
+
+
+def reduce(items: Iterable[float], bin_size: float) -> tuple[int, list[float]]:
+    """Number of bins that an optimal solution can be assumed to contain, and the items left.
+    See fixed_bins.
+    """
+    bins, free = fixed_bins(items, bin_size)
+    return len(bins), free
+
+
+def fixed_bins(items: Iterable[float], bin_size: float) -> tuple[list[list[float]], list[float]]:
+    """Bins that an optimal solution can be assumed to contain, and the items left.
+    From the biggest item x, a bin is fixed when it is dominant:
+        - no other item fits with x
+        - the biggest item y that fits with x fills the bin exactly
+        - at most one item fits with x, then it might as well be the biggest one
+    """
+    free = sorted(items)
+    bins = []
+    for x in sorted(free, reverse=True):
+        i = bisect_left(free, x)
+        if i == len(free) or free[i] != x:
+            continue        # Already in a fixed bin
+        del free[i]
+        j = bisect_right(free, bin_size - x) - 1       # Biggest item fitting with x
+        if j < 0:
+            bins.append([x])
+        elif (x + free[j] == bin_size or len(free) < 2
+              or x + free[0] + free[1] > bin_size):
+            bins.append([x, free.pop(j)])
+        else:
+            insort(free, x)
+    return bins, free
+
+
+def l3(items: Iterable[float], bin_size: float) -> int:
+    """L2 of the items left by the reduction, plus the bins it fixed."""
+    fixed, free = reduce(items, bin_size)
+    return fixed + l2(free, bin_size)
+
+
+def lower_bound(items: Iterable[float], bin_size: float) -> int:
+    """Best of all bounds."""
+    items = list(items)
+    return max(l1(items, bin_size), l2(items, bin_size), l3(items, bin_size))
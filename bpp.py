@@ -1,23 +1,41 @@
 """Bin packing problem model."""
 
 from __future__ import annotations
+from array import array
 from dataclasses import dataclass, field
-from math import ceil
+from typing import Sequence
 from copy import deepcopy
-from functools import lru_cache
+from functools import cached_property
+import numbers
+import random
+
+import numpy as np
+
+import bounds
 import files
+import hashing
+from gap_index import GapIndex
 
 
 @dataclass(frozen=True, eq=True)
 class BPInstance:
-    """All the inputs needed to describe a Bin Packing Problem"""
+    """All the inputs needed to describe a Bin Packing Problem.
+    Items are kept in a compact array, 8 bytes each instead of a pointer to a Python number,
+    which NumPy can also view without copying (see BPSolution.as_arrays).
+    """
     bin_size: float
-    items: tuple[float]
+    items: array
 
     def __post_init__(self):
-        """Cast self.transfers to a frozenset, allowing instantiating class with any iterable."""
+        """Cast self.items to an array, allowing instantiating class with any iterable."""
         # https://docs.python.org/3/library/dataclasses.html#frozen-instances
-        object.__setattr__(self, 'items', tuple(self.items))
+        items = list(self.items)
+        typecode = 'q' if all(isinstance(item, numbers.Integral) for item in items) else 'd'
+        object.__setattr__(self, 'items', array(typecode, items))
+
+    def __hash__(self):
+        """Arrays are mutable and not hashable, but instance items are never changed."""
+        return hash((self.bin_size, tuple(self.items)))
 
     @classmethod
     def from_reader(cls, reader: files.InstanceReader):
@@ -31,90 +49,135 @@ class BPInstance:
         """Allows easier iteration."""
         return self.items.__iter__()
 
-    def sort_decreasing(self) -> BPInstance:
-        """Returns new instance with items sorted."""
-        items = sorted(self.items, reverse=True)
-        sorted_instance = self.__class__(self.bin_size, items)
-        return sorted_instance
+    def __deepcopy__(self, memo):
+        """Instances are immutable, copies can share them."""
+        return self
 
-    @property
-    @lru_cache
+    @cached_property
+    def ids_by_weight(self) -> list[int]:
+        """Item ids sorted by increasing weight."""
+        return sorted(range(len(self.items)), key=self.items.__getitem__)
+
+    @cached_property
     def lower_bound(self) -> int:
-        """Minimun number of bins required."""
-        return ceil(sum(self.items) / self.bin_size)
+        """Minimun number of bins required, best of the bounds module."""
+        return bounds.lower_bound(self.items, self.bin_size)
 
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Bin:
-    """Some properties and methods are cached to reduce computation time.
-    Cache must be cleared when the Bin changes (item added or removed).
+    """Items are identified by their index in the instance, `weights` is shared by every bin.
+    Load is tracked incrementally on every change,
+    so content, gap, fits and is_full are O(1) and local to each bin.
+    The position of each id is tracked too, so removing an item is O(1) and unambiguous,
+    and so is its key (see hashing), identifying its items regardless of their order.
     """
     size: float
-    items: list[float] = field(default_factory=list)
+    weights: Sequence[float] = field(repr=False)
+    ids: list[int] = field(default_factory=list)
     closed: bool = False
+    _content: float = field(init=False, repr=False)
+    _positions: dict[int, int] = field(init=False, repr=False)
+    _key: int = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._content = sum(self.weights[item_id] for item_id in self.ids)
+        self._positions = {item_id: position for position, item_id in enumerate(self.ids)}
+        self._key = 0
+        for item_id in self.ids:
+            self._key ^= hashing.item_key(item_id)
 
     def __iter__(self):
-        """Allows easier iteration."""
-        return self.items.__iter__()
+        """Allows easier iteration over the weights of the items."""
+        return (self.weights[item_id] for item_id in self.ids)
 
-    def append(self, item) -> None:
-        """Safely append item to bin."""
-        if item <= 0:
-            raise ValueError("Item weight must be bigger than zero.")
-        self._clear_cache()
-        self.items.append(item)
+    def __len__(self):
+        return self.ids.__len__()
 
-    def pop(self, index) -> float:
-        self._clear_cache()
-        return self.items.pop(index)
+    def __deepcopy__(self, memo):
+        """Weights are shared, only ids are copied."""
+        return self.__class__(self.size, self.weights, self.ids.copy(), self.closed)
 
-    def remove(self, item) -> None:
-        self._clear_cache()
-        self.items.remove(item)
+    @property
+    def items(self) -> list[float]:
+        """Weights of the items in bin."""
+        return [self.weights[item_id] for item_id in self.ids]
+
+    def append(self, item_id) -> None:
+        """Safely append item to bin."""
+        if self.weights[item_id] <= 0:
+            raise ValueError("Item weight must be bigger than zero.")
+        self._positions[item_id] = len(self.ids)
+        self.ids.append(item_id)
+        self._content += self.weights[item_id]
+        self._key ^= hashing.item_key(item_id)
+
+    def remove(self, item_id) -> None:
+        """The last item takes the place of the removed one."""
+        position = self._positions.pop(item_id)
+        last = self.ids.pop()
+        if last != item_id:
+            self.ids[position] = last
+            self._positions[last] = position
+        self._content -= self.weights[item_id]
+        self._key ^= hashing.item_key(item_id)
 
-    @lru_cache
     def fits(self, item) -> bool:
-        """Check if item fits in bin."""
-        return item <= self.gap
+        """Check if item (a weight) fits in bin."""
+        return item <= self.size - self._content
 
     @property
-    @lru_cache
     def gap(self) -> float:
         """Empty space in bin."""
-        return (self.size - self.content)
+        return self.size - self._content
 
     @property
-    @lru_cache
     def content(self) -> float:
         """Total weight of items in bin."""
-        return sum(self.items)
+        return self._content
 
-    def _clear_cache(self):
-        """Clear all cached properties."""
-        self.__class__.fits.cache_clear()
-        self.__class__.gap.fget.cache_clear()   # .fget needed because its a property
-        self.__class__.content.fget.cache_clear()
+    @property
+    def key(self) -> int:
+        return self._key
 
     @property
     def is_empty(self) -> bool:
-        return len(self.items) == 0
+        return len(self.ids) == 0
 
     @property
     def is_full(self) -> bool:
-        return self.content == self.size
+        return self._content == self.size
 
 
 @dataclass
 class BPSolution:
+    """Bins should be changed through these methods, which keep the gap index up to date.
+    Items are packed and moved by id, their index in `weights` (the instance items).
+    """
     bin_size: float
+    weights: Sequence[float] = field(repr=False)
     bins: list[Bin] = field(default_factory=list)
 
+    # Built on first query and then maintained by every change, see gap_index
+    _gap_index: GapIndex | None = field(default=None, init=False, repr=False, compare=False)
+
+    # Bin index of each item id, built on first query and maintained like the gap index
+    _bin_indices: list[int | None] | None = field(default=None, init=False, repr=False,
+                                                  compare=False)
+
     def __post_init__(self):
         """Always add first empty bin."""
         self.add_empty_bin()
 
     def add_empty_bin(self) -> None:
-        self.bins.append(Bin(self.bin_size))
+        self.bins.append(Bin(self.bin_size, self.weights))
+        if self._gap_index is not None:
+            self._gap_index.append(self.bin_size)
+
+    def insert_empty_bin(self, index) -> None:
+        self.bins.insert(index, Bin(self.bin_size, self.weights))
+        self._gap_index = None
+        self._bin_indices = None
 
     def __iter__(self):
         """Allows easier iteration."""
@@ -130,21 +193,264 @@ class BPSolution:
     def last_bin(self) -> Bin:
         return self.bins[-1]
 
-    def pack_in_new_bin(self, item) -> None:
-        """Do not create new bin if last one is empty."""
-        if self.last_bin.is_empty:
-            self.last_bin.append(item)
-        else:
-            new_bin = Bin(self.bin_size)
-            new_bin.append(item)
-            self.bins.append(new_bin)
+    @property
+    def gap_index(self) -> GapIndex:
+        if self._gap_index is None:
+            self._gap_index = GapIndex(bin.gap for bin in self.bins)
+        return self._gap_index
+
+    def _bin_changed(self, index) -> None:
+        if self._gap_index is not None:
+            self._gap_index.update(index, self.bins[index].gap)
+
+    def first_fit(self, item) -> int | None:
+        """Index of the first bin where item (a weight) fits."""
+        return self.gap_index.first(item)
+
+    def best_fit(self, item) -> int | None:
+        """Index of the bin where item (a weight) fits leaving the smallest gap."""
+        return self.gap_index.best(item)
+
+    def bins_fitting(self, item) -> list[int]:
+        """Indices of every bin where item (a weight) fits."""
+        return self.gap_index.fitting(item)
+
+    def count_fitting(self, item) -> int:
+        """Number of bins where item (a weight) fits, O(log bins)."""
+        return self.gap_index.count_fitting(item)
+
+    def random_fitting(self, item) -> int | None:
+        """Index of a random bin where item (a weight) fits, O(log bins)."""
+        return self.gap_index.random_fitting(item)
 
-    def move_item(self, bin_from, item, bin_to) -> None:
-        self.bins[bin_from].remove(item)
-        self.bins[bin_to].append(item)
+    def random_open_bin(self) -> int | None:
+        """Index of a random bin that is not full, O(log bins)."""
+        return self.gap_index.random_open()
+
+    @property
+    def max_gap(self) -> float:
+        return self.gap_index.max_gap
+
+    def bin_of(self, item_id) -> int | None:
+        """Index of the bin holding item, None if not packed."""
+        if self._bin_indices is None:
+            self._bin_indices = [None] * len(self.weights)
+            for index, bin in enumerate(self.bins):
+                for packed_id in bin.ids:
+                    self._bin_indices[packed_id] = index
+        return self._bin_indices[item_id]
+
+    def pack(self, bin_index, item_id) -> None:
+        bin_index %= len(self.bins)
+        self.bins[bin_index].append(item_id)
+        self._bin_changed(bin_index)
+        if self._bin_indices is not None:
+            self._bin_indices[item_id] = bin_index
+
+    def pack_in_new_bin(self, item_id) -> None:
+        """Do not create new bin if last one is empty."""
+        if not self.last_bin.is_empty:
+            self.add_empty_bin()
+        self.pack(-1, item_id)
+
+    def move_item(self, bin_from, item_id, bin_to) -> None:
+        self.bins[bin_from].remove(item_id)
+        self.bins[bin_to].append(item_id)
+        self._bin_changed(bin_from)
+        self._bin_changed(bin_to)
+        if self._bin_indices is not None:
+            self._bin_indices[item_id] = bin_to % len(self.bins)
 
     def remove_empty_bins(self):
-        self.bins = [b for b in self.bins if not b.is_empty]
+        bins = [b for b in self.bins if not b.is_empty]
+        if len(bins) != len(self.bins):
+            self.bins = bins
+            self._gap_index = None
+            self._bin_indices = None
+
+    def as_arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Weights, bin index and id of every item (grouped by bin), and load of every bin."""
+        ids = np.array([item_id for bin in self for item_id in bin.ids], dtype=np.intp)
+        weights = np.asarray(self.weights)[ids]      # No copy of the weights if an array
+        assignment = np.repeat(np.arange(len(self)), [len(bin.ids) for bin in self])
+        loads = np.array([bin.content for bin in self])
+        return weights, assignment, loads, ids
 
     def copy(self):
         return deepcopy(self)
+
+
+class ArrayBin:
+    """Read-only view over one bin of an ArrayBPSolution.
+    Exposes the same interface as Bin, so explorers and plots can iterate it unchanged.
+    """
+    __slots__ = ('solution', 'index')
+
+    def __init__(self, solution: ArrayBPSolution, index: int) -> None:
+        self.solution = solution
+        self.index = index
+
+    def __iter__(self):
+        """Allows easier iteration."""
+        return self.items.__iter__()
+
+    def __len__(self):
+        return self.solution.counts[self.index].item()
+
+    @property
+    def ids(self) -> list[int]:
+        return np.flatnonzero(self.solution.assignment == self.index).tolist()
+
+    @property
+    def items(self) -> list[float]:
+        return self.solution.weights[self.solution.assignment == self.index].tolist()
+
+    @property
+    def key(self) -> int:
+        key = 0
+        for item_id in self.ids:
+            key ^= hashing.item_key(item_id)
+        return key
+
+    @property
+    def size(self) -> float:
+        return self.solution.bin_size
+
+    def fits(self, item) -> bool:
+        """Check if item fits in bin."""
+        return item <= self.gap
+
+    @property
+    def gap(self) -> float:
+        """Empty space in bin."""
+        return self.size - self.content
+
+    @property
+    def content(self) -> float:
+        """Total weight of items in bin."""
+        return self.solution.loads[self.index].item()
+
+    @property
+    def is_empty(self) -> bool:
+        return self.solution.counts[self.index] == 0
+
+    @property
+    def is_full(self) -> bool:
+        return self.content == self.size
+
+
+@dataclass
+class ArrayBPSolution:
+    """Compact BPSolution: an item-to-bin assignment array plus per-bin load and count vectors.
+    Copying it is a few array copies instead of cloning a list of Bin objects.
+    It is built from an existing solution (see from_solution), so it does not pack new items.
+    """
+    bin_size: float
+    weights: np.ndarray         # of each item id, shared between copies, never modified
+    assignment: np.ndarray      # bin index of each item id
+    loads: np.ndarray           # total weight of each bin
+    counts: np.ndarray          # number of items in each bin
+
+    @classmethod
+    def from_solution(cls, solution: BPSolution) -> ArrayBPSolution:
+        weights = np.array(solution.weights)
+        assignment = np.empty(len(weights), dtype=np.intp)
+        for index, bin in enumerate(solution):
+            assignment[bin.ids] = index
+        loads = np.zeros(len(solution), dtype=weights.dtype)
+        np.add.at(loads, assignment, weights)
+        counts = np.bincount(assignment, minlength=len(solution))
+        return cls(solution.bin_size, weights, assignment, loads, counts)
+
+    def to_solution(self) -> BPSolution:
+        weights = tuple(self.weights.tolist())
+        solution = BPSolution(self.bin_size, weights,
+                              [Bin(self.bin_size, weights, bin.ids) for bin in self])
+        solution.remove_empty_bins()
+        return solution
+
+    @property
+    def bins(self) -> list[ArrayBin]:
+        return [ArrayBin(self, index) for index in range(len(self))]
+
+    def __iter__(self):
+        """Allows easier iteration."""
+        return (ArrayBin(self, index) for index in range(len(self)))
+
+    def __getitem__(self, index):
+        return ArrayBin(self, range(len(self))[index])
+
+    def __len__(self):
+        return self.loads.__len__()
+
+    @property
+    def last_bin(self) -> ArrayBin:
+        return self[-1]
+
+    def insert_empty_bin(self, index) -> None:
+        self.assignment[self.assignment >= index] += 1
+        self.loads = np.insert(self.loads, index, 0)
+        self.counts = np.insert(self.counts, index, 0)
+
+    def first_fit(self, item) -> int | None:
+        """Index of the first bin where item fits."""
+        fitting = self.bins_fitting(item)
+        return fitting[0] if fitting else None
+
+    def bins_fitting(self, item) -> list[int]:
+        """Indices of every bin where item fits."""
+        return np.flatnonzero(item <= self.bin_size - self.loads).tolist()
+
+    def count_fitting(self, item) -> int:
+        """Number of bins where item fits."""
+        return int(np.count_nonzero(item <= self.bin_size - self.loads))
+
+    def random_fitting(self, item) -> int | None:
+        """Index of a random bin where item fits."""
+        fitting = self.bins_fitting(item)
+        return random.choice(fitting) if fitting else None
+
+    def random_open_bin(self) -> int | None:
+        """Index of a random bin that is not full."""
+        open_bins = np.flatnonzero(self.loads < self.bin_size).tolist()
+        return random.choice(open_bins) if open_bins else None
+
+    @property
+    def max_gap(self) -> float:
+        return self.bin_size - self.loads.min().item()
+
+    def bin_of(self, item_id) -> int:
+        """Index of the bin holding item."""
+        return self.assignment[item_id].item()
+
+    def move_item(self, bin_from, item_id, bin_to) -> None:
+        if self.assignment[item_id] != bin_from:
+            raise ValueError(f"Item {item_id} not in bin {bin_from}.")
+        item = self.weights[item_id]
+        self.assignment[item_id] = bin_to
+        self.loads[bin_from] -= item
+        self.loads[bin_to] += item
+        self.counts[bin_from] -= 1
+        self.counts[bin_to] += 1
+
+    def remove_empty_bins(self):
+        keep = self.counts > 0
+        if keep.all():
+            return
+        new_index = np.cumsum(keep) - 1
+        self.assignment = new_index[self.assignment]
+        self.loads = self.loads[keep]
+        self.counts = self.counts[keep]
+
+    def as_arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Weights, bin index and id of every item (grouped by bin), and load of every bin."""
+        ids = np.argsort(self.assignment, kind='stable')
+        return self.weights[ids], self.assignment[ids], self.loads, ids
+
+    def copy(self):
+        return self.__class__(self.bin_size, self.weights,
+                              self.assignment.copy(), self.loads.copy(), self.counts.copy())
+
+    def __deepcopy__(self, memo):
+        """Weights are immutable, only the mutable state needs copying."""
+        return self.copy()
@@ -0,0 +1,333 @@
+"""Batch evaluation of moves with NumPy broadcasting.
+
+A solution is described by three arrays, with items grouped by bin in enumeration order:
+    weights[i]      weight of item i
+    assignment[i]   bin index of item i
+    loads[j]        total weight of bin j
+
+Every transfer (item i to bin j) and every swap (item i with item k) is scored at once.
+Fitness is the sum of squared loads, so a move that shifts `d` weight from bin b to bin a
+changes it by (La + d)**2 + (Lb - d)**2 - La**2 - Lb**2 = 2*d*(La - Lb + d).
+"""
+
+from __future__ import annotations
+from typing import NamedTuple
+import random
+
+import numpy as np
+
+
+class Candidate(NamedTuple):
+    """Best move found. For transfers `second` is the destination bin,
+    for swaps it is the index of the other item."""
+    delta: float
+    is_swap: bool
+    first: int
+    second: int
+
+
+def transfer_deltas(weights, assignment, loads, bin_size, skip_full_bins=False) -> np.ndarray:
+    """Matrix items x bins of fitness deltas, -inf where the transfer is not possible."""
+    sources = loads[assignment]
+    destinations = loads[np.newaxis, :]
+    weights = weights[:, np.newaxis]
+
+    feasible = destinations + weights <= bin_size
+    feasible[np.arange(len(assignment)), assignment] = False     # Do not transfer to same bin
+    if skip_full_bins:
+        feasible[sources == bin_size] = False
+
+    deltas = 2 * weights * (destinations - sources[:, np.newaxis] + weights)
+    return np.where(feasible, deltas, -np.inf)
+
+
+def swap_deltas(weights, assignment, loads, bin_size, skip_full_bins=False) -> np.ndarray:
+    """Matrix items x items of fitness deltas, -inf where the swap is not possible.
+    Only swaps from a lower to a higher bin index are considered, avoiding duplicates.
+    """
+    loads_first = loads[assignment][:, np.newaxis]
+    loads_second = loads[assignment][np.newaxis, :]
+    diff = weights[np.newaxis, :] - weights[:, np.newaxis]     # weight gained by first bin
+
+    feasible = (
+        (assignment[:, np.newaxis] < assignment[np.newaxis, :]) &
+        (diff != 0) &       # Do not swap equal items
+        (loads_first + diff <= bin_size) &
+        (loads_second - diff <= bin_size)
+    )
+    if skip_full_bins:
+        full = loads[assignment] == bin_size
+        feasible &= ~full[:, np.newaxis]
+        feasible &= ~full[np.newaxis, :]
+
+    deltas = 2 * diff * (loads_first - loads_second + diff)
+    return np.where(feasible, deltas, -np.inf)
+
+
+def best_move(weights, assignment, loads, bin_size, skip_full_bins=False,
+              counters=None) -> Candidate | None:
+    """Best transfer or swap, ties broken in the same order as possible_moves().
+    Returns None when no move is possible.
+    Feasible and scored moves are added to `counters` (instrumentation.SearchStats) if given.
+    """
+    best = None
+    for is_swap, deltas in (
+        (False, transfer_deltas(weights, assignment, loads, bin_size, skip_full_bins)),
+        (True, swap_deltas(weights, assignment, loads, bin_size, skip_full_bins)),
+    ):
+        if counters is not None:
+            counters.moves_generated += int(np.count_nonzero(deltas != -np.inf))
+            counters.moves_evaluated += deltas.size
+        if deltas.size == 0:
+            continue
+        first, second = np.unravel_index(np.argmax(deltas), deltas.shape)
+        delta = deltas[first, second]
+        if delta == -np.inf:
+            continue
+        if best is None or delta > best.delta:
+            best = Candidate(delta.item(), is_swap, int(first), int(second))
+    return best
+
+
+def first_move(weights, assignment, loads, bin_size, skip_full_bins=False,
+               min_delta=0.0) -> Candidate | None:
+    """First transfer or swap improving fitness by more than `min_delta`, in the same order
+    as possible_moves(): transfers before swaps, then by item and bin.
+    Returns None when no move improves.
+    """
+    for is_swap, deltas in (
+        (False, transfer_deltas(weights, assignment, loads, bin_size, skip_full_bins)),
+        (True, swap_deltas(weights, assignment, loads, bin_size, skip_full_bins)),
+    ):
+        found = _first_above(deltas, min_delta)
+        if found is not None:
+            return Candidate(deltas[found].item(), is_swap, *found)
+    return None
+
+
+def _first_above(deltas: np.ndarray, min_delta: float) -> tuple[int, int] | None:
+    """Row and column of the first delta above min_delta, in row-major order."""
+    flat = np.flatnonzero(deltas > min_delta)
+    if flat.size == 0:
+        return None
+    first, second = np.unravel_index(flat[0], deltas.shape)
+    return int(first), int(second)
+
+
+class BinPairCache:
+    """Best delta of the moves between every pair of bins, kept between local search steps.
+    A move only changes the loads of its two bins, so after it only the pairs involving
+    those bins are evaluated again: O(items) per step instead of O(items**2).
+    """
+
+    def __init__(self, weights, assignment, loads, bin_size, skip_full_bins=False,
+                 counters=None, shuffle=False) -> None:
+        self.bin_size = bin_size
+        self.skip_full_bins = skip_full_bins
+        self.counters = counters
+        self._set_arrays(weights, assignment, loads)
+
+        transfers = transfer_deltas(weights, assignment, loads, bin_size, skip_full_bins)
+        swaps = swap_deltas(weights, assignment, loads, bin_size, skip_full_bins)
+        self._count(transfers)
+        self._count(swaps)
+        transfers = self._reduce(transfers, axis=0)     # bin from x bin to
+        swaps = self._reduce(self._reduce(swaps, axis=0), axis=1)
+        # Symmetric, pairs[a, b] is the best move between bins a and b in any direction
+        self.pairs = np.maximum.reduce([transfers, transfers.T, swaps, swaps.T])
+        self.row_best = self.pairs.max(axis=1)
+        self.row_arg = self.pairs.argmax(axis=1)
+
+        # Bins in the order next_improving() scans them, and where it found the last move
+        self.order = np.arange(len(loads))
+        if shuffle:
+            self.order = np.array(random.sample(range(len(loads)), len(loads)), dtype=int)
+        self.cursor = 0
+
+    def _set_arrays(self, weights, assignment, loads) -> None:
+        self.weights, self.assignment, self.loads = weights, assignment, loads
+        self.counts = np.bincount(assignment, minlength=len(loads))
+        self.starts = np.concatenate(([0], np.cumsum(self.counts)[:-1]))
+        self.full = (loads == self.bin_size if self.skip_full_bins
+                     else np.zeros(len(loads), dtype=bool))
+
+    def _reduce(self, deltas: np.ndarray, axis: int) -> np.ndarray:
+        """Maximum over the items of each bin along `axis`, -inf for empty bins."""
+        if deltas.shape[axis] == 0:
+            shape = list(deltas.shape)
+            shape[axis] = len(self.loads)
+            return np.full(shape, -np.inf)
+        starts = np.minimum(self.starts, deltas.shape[axis] - 1)
+        reduced = np.maximum.reduceat(deltas, starts, axis=axis)
+        empty = np.flatnonzero(self.counts == 0)
+        reduced[(slice(None),) * axis + (empty,)] = -np.inf
+        return reduced
+
+    def _count(self, deltas: np.ndarray) -> None:
+        if self.counters is not None:
+            self.counters.moves_generated += int(np.count_nonzero(deltas != -np.inf))
+            self.counters.moves_evaluated += deltas.size
+
+    def _row(self, p: int) -> np.ndarray:
+        """Best delta between bin p and every bin, same formulas as transfer_deltas
+        and swap_deltas restricted to the moves involving p."""
+        weights, assignment, loads = self.weights, self.assignment, self.loads
+        own = weights[self.starts[p]:self.starts[p] + self.counts[p]][:, np.newaxis]
+        load = loads[p]
+
+        # Items of p to any bin
+        feasible = (loads[np.newaxis, :] + own <= self.bin_size) & ~self.full[p]
+        feasible[:, p] = False
+        deltas = np.where(feasible, 2 * own * (loads[np.newaxis, :] - load + own), -np.inf)
+        self._count(deltas)
+        transfers_out = deltas.max(axis=0, initial=-np.inf)
+
+        # Any item to p
+        sources = loads[assignment]
+        feasible = (load + weights <= self.bin_size) & (assignment != p) & ~self.full[assignment]
+        deltas = np.where(feasible, 2 * weights * (load - sources + weights), -np.inf)
+        self._count(deltas)
+        transfers_in = self._reduce(deltas, axis=0)
+
+        # Items of p with any item, diff is the weight gained by p
+        diff = weights[np.newaxis, :] - own
+        feasible = (
+            (assignment[np.newaxis, :] != p) &
+            (diff != 0) &
+            (load + diff <= self.bin_size) &
+            (sources[np.newaxis, :] - diff <= self.bin_size) &
+            ~self.full[assignment][np.newaxis, :] & ~self.full[p]
+        )
+        deltas = np.where(feasible, 2 * diff * (load - sources[np.newaxis, :] + diff), -np.inf)
+        self._count(deltas)
+        swaps = self._reduce(deltas.max(axis=0, initial=-np.inf), axis=0)
+
+        return np.maximum.reduce([transfers_out, transfers_in, swaps])
+
+    def update(self, weights, assignment, loads, changed_bins, removed_bins=()) -> None:
+        """Evaluate again the pairs involving `changed_bins`, after a move changed them.
+        Bins are given by their index before the move. `removed_bins` were emptied and removed,
+        shifting the following indices like BPSolution.remove_empty_bins().
+        """
+        removed_arg = np.zeros(len(self.row_arg), dtype=bool)
+        if removed_bins:
+            removed = np.array(sorted(removed_bins))
+            keep = np.ones(len(self.row_arg), dtype=bool)
+            keep[removed] = False
+            self.pairs = self.pairs[keep][:, keep]
+            self.row_best = self.row_best[keep]
+            removed_arg = np.isin(self.row_arg, removed)[keep]
+            self.row_arg = self.row_arg[keep] - np.searchsorted(removed, self.row_arg[keep])
+            changed_bins = [bin - np.searchsorted(removed, bin)
+                            for bin in changed_bins if bin not in removed_bins]
+            # Resume the scan from the bin that was at the cursor, or the one after it
+            self.cursor -= np.count_nonzero(np.isin(self.order[:self.cursor], removed))
+            self.order = self.order[~np.isin(self.order, removed)]
+            self.order -= np.searchsorted(removed, self.order)
+            self.cursor = self.cursor % len(self.order) if len(self.order) else 0
+
+        self._set_arrays(weights, assignment, loads)
+        changed = np.array(sorted(set(changed_bins)), dtype=int)
+        for p in changed:
+            row = self._row(p)
+            self.pairs[p, :] = row
+            self.pairs[:, p] = row
+
+        # Other rows only changed in the columns of changed bins
+        columns = self.pairs[:, changed]
+        column_arg = columns.argmax(axis=1)
+        column_best = columns[np.arange(len(columns)), column_arg]
+        better = column_best >= self.row_best
+        self.row_best[better] = column_best[better]
+        self.row_arg[better] = changed[column_arg[better]]
+
+        # The maximum of a row may have decreased, only these need a full scan
+        stale = (np.isin(self.row_arg, changed) | removed_arg) & ~better
+        stale[changed] = True
+        self.row_best[stale] = self.pairs[stale].max(axis=1)
+        self.row_arg[stale] = self.pairs[stale].argmax(axis=1)
+
+    def best(self) -> Candidate | None:
+        """Best move of all, like best_move()."""
+        p = int(np.argmax(self.row_best))
+        if self.row_best[p] == -np.inf:
+            return None
+        return self._between(p, int(self.row_arg[p]))
+
+    def first(self, min_delta: float = 0.0) -> Candidate | None:
+        """First move improving by more than min_delta, like first_move().
+        Only bins with such a move in some pair are scanned, first for transfers leaving them,
+        then for swaps with a later bin.
+        """
+        rows = np.flatnonzero(self.row_best > min_delta)
+        for scan in (self._first_transfer_from, self._first_swap_from):
+            for p in rows:
+                candidate = scan(int(p), min_delta)
+                if candidate is not None:
+                    return candidate
+        return None
+
+    def _first_transfer_from(self, p: int, min_delta: float) -> Candidate | None:
+        """First improving transfer of an item of p, by item and then destination bin."""
+        if self.full[p]:
+            return None
+        loads = self.loads
+        own = self.weights[self.starts[p]:self.starts[p] + self.counts[p]][:, np.newaxis]
+        feasible = loads[np.newaxis, :] + own <= self.bin_size
+        feasible[:, p] = False
+        deltas = np.where(feasible, 2 * own * (loads[np.newaxis, :] - loads[p] + own), -np.inf)
+        self._count(deltas)
+        found = _first_above(deltas, min_delta)
+        if found is None:
+            return None
+        return Candidate(deltas[found].item(), False, int(self.starts[p]) + found[0], found[1])
+
+    def _first_swap_from(self, p: int, min_delta: float) -> Candidate | None:
+        """First improving swap of an item of p with one of a later bin, by item and then
+        by the position of the other item."""
+        if self.full[p]:
+            return None
+        weights, assignment, load = self.weights, self.assignment, self.loads[p]
+        own = weights[self.starts[p]:self.starts[p] + self.counts[p]][:, np.newaxis]
+        sources = self.loads[assignment][np.newaxis, :]
+        diff = weights[np.newaxis, :] - own     # weight gained by p
+        feasible = (
+            (assignment[np.newaxis, :] > p) &
+            (diff != 0) &
+            (load + diff <= self.bin_size) &
+            (sources - diff <= self.bin_size) &
+            ~self.full[assignment][np.newaxis, :]
+        )
+        deltas = np.where(feasible, 2 * diff * (load - sources + diff), -np.inf)
+        self._count(deltas)
+        found = _first_above(deltas, min_delta)
+        if found is None:
+            return None
+        return Candidate(deltas[found].item(), True, int(self.starts[p]) + found[0], found[1])
+
+    def next_improving(self, min_delta: float = 0.0) -> Candidate | None:
+        """Like first(), but bins are scanned in `order` starting from the bin of the last
+        move found, wrapping around, instead of scanning again the non-improving ones before it.
+        Between the two bins found, the first improving move in the order of possible_moves().
+        """
+        order = np.roll(self.order, -self.cursor)
+        positions = np.flatnonzero(self.row_best[order] > min_delta)
+        if positions.size == 0:
+            return None
+        self.cursor = (self.cursor + int(positions[0])) % len(order)
+        p = int(order[positions[0]])
+        columns = order[self.pairs[p, order] > min_delta]
+        return self._between(p, int(columns[0]), min_delta)
+
+    def _between(self, a: int, b: int, min_delta: float = None) -> Candidate:
+        """Best move between bins a and b, in terms of the full arrays.
+        With min_delta, the first one improving by more than it instead, see first_move().
+        """
+        a, b = min(a, b), max(a, b)
+        items = np.concatenate([np.arange(self.starts[a], self.starts[a] + self.counts[a]),
+                                np.arange(self.starts[b], self.starts[b] + self.counts[b])])
+        arrays = (self.weights[items], np.repeat([0, 1], [self.counts[a], self.counts[b]]),
+                  self.loads[[a, b]], self.bin_size, self.skip_full_bins)
+        local = best_move(*arrays) if min_delta is None else first_move(*arrays, min_delta)
+        second = items[local.second] if local.is_swap else (a, b)[local.second]
+        return Candidate(local.delta, local.is_swap, int(items[local.first]), int(second))
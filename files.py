@@ -1,6 +1,11 @@
-from dataclasses import dataclass
+from __future__ import annotations
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Iterator
+import json
+import os
+
+import numpy as np
 
 
 @dataclass
@@ -32,39 +37,149 @@ class InstanceReader:
             return float(s)
 
 
+@dataclass
+class CompiledInstanceReader:
+    """Same interface as InstanceReader, items are read from an InstanceStore."""
+    path: Path
+    number_of_items: int
+    bin_size: float
+    store: InstanceStore = field(repr=False)
+    offset: int = field(repr=False)
+    integral: bool = field(repr=False)
+
+    @property
+    def array(self) -> np.ndarray:
+        """Read-only view of the items in the memory-mapped store, no copy is made."""
+        return self.store.items[self.offset:self.offset + self.number_of_items]
+
+    @property
+    def items(self):
+        """Items as python numbers, int when the file had only integers."""
+        array = self.array.astype(np.int64) if self.integral else self.array
+        return iter(array.tolist())
+
+
+class InstanceStore:
+    """Every instance of a folder compiled into a single memory-mapped array of items,
+    plus a JSON index with the header and position of each file.
+    Compiled on first use, and again whenever a file is added, removed or modified.
+    """
+    cache_folder = Path('.cache')
+
+    def __init__(self, folder: Path) -> None:
+        self.folder = folder
+        self.index_file = self.cache_folder / f'{folder.name}.json'
+        self.items_file = self.cache_folder / f'{folder.name}.npy'
+
+        stamps = self._stamps()
+        index = self._read_index()
+        if index is None or index['stamps'] != stamps:
+            index = self._compile(stamps)
+
+        # An empty array cannot be memory-mapped
+        self.items = (np.load(self.items_file, mmap_mode='r') if index['total']
+                      else np.empty(0))
+        self.readers = {
+            Path(entry['path']): CompiledInstanceReader(
+                Path(entry['path']), entry['number_of_items'], entry['bin_size'],
+                self, entry['offset'], entry['integral'])
+            for entry in index['instances']
+        }
+
+    def _stamps(self) -> dict[str, list[int]]:
+        """Modification time and size of every file, to detect changes without reading them."""
+        stamps = {}
+        for path in sorted(Instances.find_all_files(self.folder)):
+            stat = path.stat()
+            stamps[str(path)] = [stat.st_mtime_ns, stat.st_size]
+        return stamps
+
+    def _read_index(self) -> dict | None:
+        try:
+            index = json.loads(self.index_file.read_text())
+        except (OSError, ValueError):
+            return None
+        return index if self.items_file.exists() else None
+
+    def _compile(self, stamps: dict[str, list[int]]) -> dict:
+        """Parse every file once and save items and index."""
+        instances, arrays, offset = [], [], 0
+        for path in stamps:
+            reader = InstanceReader(Path(path))
+            items = list(reader.items)
+            instances.append({
+                'path': path,
+                'number_of_items': len(items),
+                'bin_size': reader.bin_size,
+                'offset': offset,
+                'integral': all(isinstance(item, int) for item in items),
+            })
+            arrays.append(np.array(items, dtype=np.float64))
+            offset += len(items)
+
+        index = {'stamps': stamps, 'instances': instances, 'total': offset}
+        # Written to a temporary file first, so concurrent processes never read half a file
+        self.cache_folder.mkdir(parents=True, exist_ok=True)
+        # Ignores the whole folder, so a cache created inside a repository is never committed
+        (self.cache_folder / '.gitignore').write_text('*\n')
+        temporary = self.items_file.with_name(f'{self.items_file.stem}.{os.getpid()}.npy')
+        np.save(temporary, np.concatenate(arrays) if arrays else np.empty(0))
+        os.replace(temporary, self.items_file)
+        temporary = self.index_file.with_suffix(f'.{os.getpid()}.tmp')
+        temporary.write_text(json.dumps(index))
+        os.replace(temporary, self.index_file)
+        return index
+
+
 class Instances:
     """Helper class to explore the ./instances/ folder."""
     parent_folder = Path('instances')
     easy_threshold = 150
     hard_threshold = 500
+    _store: InstanceStore = None
 
     @classmethod
-    def all(cls) -> Iterator[InstanceReader]:
-        return (InstanceReader(file) for file in cls.find_all_files(cls.parent_folder))
+    def store(cls) -> InstanceStore:
+        """Compiled instances, checked for changes once per process."""
+        if cls._store is None or cls._store.folder != cls.parent_folder:
+            cls._store = InstanceStore(cls.parent_folder)
+        return cls._store
 
     @classmethod
-    def easy(cls) -> Iterator[InstanceReader]:
+    def reader(cls, path: Path) -> CompiledInstanceReader | InstanceReader:
+        """Reader for a single file, from the store when possible."""
+        return cls.store().readers.get(Path(path)) or InstanceReader(Path(path))
+
+    @classmethod
+    def all(cls) -> Iterator[CompiledInstanceReader]:
+        return iter(cls.store().readers.values())
+
+    @classmethod
+    def easy(cls) -> Iterator[CompiledInstanceReader]:
         return (instance for instance in cls.all()
                 if instance.number_of_items <= cls.easy_threshold)
 
     @classmethod
-    def medium(cls) -> Iterator[InstanceReader]:
+    def medium(cls) -> Iterator[CompiledInstanceReader]:
         return (instance for instance in cls.all()
                 if cls.easy_threshold <= instance.number_of_items <= cls.hard_threshold)
 
     @classmethod
-    def hard(cls) -> Iterator[InstanceReader]:
+    def hard(cls) -> Iterator[CompiledInstanceReader]:
         return (instance for instance in cls.all()
                 if cls.hard_threshold <= instance.number_of_items)
 
     @classmethod
-    def hard28(self) -> Iterator[InstanceReader]:
-        return (InstanceReader(file) for file in self.find_all_files(self.parent_folder/'Hard28'))
+    def hard28(cls) -> Iterator[CompiledInstanceReader]:
+        return cls.subfolder(cls.parent_folder/'Hard28')
+
+    @classmethod
+    def falkenauer(cls) -> Iterator[CompiledInstanceReader]:
+        return cls.subfolder(cls.parent_folder/'Falkenauer')
 
     @classmethod
-    def falkenauer(self) -> Iterator[InstanceReader]:
-        return (InstanceReader(file)
-                for file in self.find_all_files(self.parent_folder/'Falkenauer'))
+    def subfolder(cls, folder: Path) -> Iterator[CompiledInstanceReader]:
+        return (instance for instance in cls.all() if instance.path.is_relative_to(folder))
 
     def find_all_files(path):
         yield from path.rglob('*.*')
@@ -0,0 +1,108 @@
+"""Index over the residual capacity (gap) of the bins of a solution."""
+
+from __future__ import annotations
+from bisect import bisect_left, insort
+from math import inf
+import random
+from typing import Iterable
+
+
+class GapIndex:
+    """Answers "which bins can receive this item" without scanning every bin.
+
+    Two structures are kept in sync:
+    - a max segment tree over gaps, for the first bin with gap >= x in O(log bins).
+    - a sorted list of (gap, bin index), for every bin (or the tightest one)
+      with gap >= x by bisection.
+    """
+
+    def __init__(self, gaps: Iterable[float] = ()) -> None:
+        self.rebuild(gaps)
+
+    def rebuild(self, gaps: Iterable[float]) -> None:
+        self.gaps = list(gaps)
+
+        self._capacity = 1
+        while self._capacity < len(self.gaps):
+            self._capacity *= 2
+        self._tree = [-inf] * (2 * self._capacity)
+        self._tree[self._capacity:self._capacity + len(self.gaps)] = self.gaps
+        for node in reversed(range(1, self._capacity)):
+            self._tree[node] = max(self._tree[2*node], self._tree[2*node + 1])
+
+        self._sorted = sorted((gap, index) for index, gap in enumerate(self.gaps))
+
+    def __len__(self):
+        return self.gaps.__len__()
+
+    def update(self, index: int, gap: float) -> None:
+        """Bin at `index` changed its gap."""
+        old_gap = self.gaps[index]
+        if old_gap == gap:
+            return
+        self.gaps[index] = gap
+        del self._sorted[bisect_left(self._sorted, (old_gap, index))]
+        insort(self._sorted, (gap, index))
+        self._update_tree(index, gap)
+
+    def append(self, gap: float) -> None:
+        """New bin at the end."""
+        if len(self.gaps) == self._capacity:
+            self.rebuild(self.gaps + [gap])
+            return
+        self.gaps.append(gap)
+        insort(self._sorted, (gap, len(self.gaps) - 1))
+        self._update_tree(len(self.gaps) - 1, gap)
+
+    def _update_tree(self, index: int, gap: float) -> None:
+        node = index + self._capacity
+        self._tree[node] = gap
+        node //= 2
+        while node:
+            self._tree[node] = max(self._tree[2*node], self._tree[2*node + 1])
+            node //= 2
+
+    def first(self, item: float) -> int | None:
+        """Index of the first bin where item fits."""
+        if self._tree[1] < item:
+            return None
+        node = 1
+        while node < self._capacity:
+            node *= 2
+            if self._tree[node] < item:
+                node += 1
+        return node - self._capacity
+
+    def best(self, item: float) -> int | None:
+        """Index of the bin where item fits leaving the smallest gap (first one on ties)."""
+        position = bisect_left(self._sorted, (item, -1))
+        if position == len(self._sorted):
+            return None
+        return self._sorted[position][1]
+
+    def count_fitting(self, item: float) -> int:
+        """Number of bins where item fits."""
+        return len(self._sorted) - bisect_left(self._sorted, (item, -1))
+
+    def random_fitting(self, item: float) -> int | None:
+        """Index of a bin where item fits, uniformly random among them."""
+        position = bisect_left(self._sorted, (item, -1))
+        if position == len(self._sorted):
+            return None
+        return self._sorted[random.randrange(position, len(self._sorted))][1]
+
+    def random_open(self) -> int | None:
+        """Index of a bin with some gap left, uniformly random among them."""
+        position = bisect_left(self._sorted, (0, inf))
+        if position == len(self._sorted):
+            return None
+        return self._sorted[random.randrange(position, len(self._sorted))][1]
+
+    @property
+    def max_gap(self) -> float:
+        return self._tree[1]
+
+    def fitting(self, item: float) -> list[int]:
+        """Indices of every bin where item fits, in increasing order."""
+        position = bisect_left(self._sorted, (item, -1))
+        return sorted(index for _, index in self._sorted[position:])
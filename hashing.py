@@ -0,0 +1,59 @@
+"""Order-independent fingerprint of a solution, in the style of Zobrist hashing.
+
+Every item id gets a random 64 bit key. The key of a bin is the XOR of the keys of its items,
+so it is updated in O(1) when an item enters or leaves it. The fingerprint of a solution is
+the sum of the mixed keys of its bins, so neither the order of the items in a bin nor the
+order of the bins matters, and a move only needs to update the bins it touches.
+"""
+
+from collections import OrderedDict
+from functools import cache
+
+MASK = (1 << 64) - 1
+
+
+def _mix(x: int) -> int:
+    """splitmix64 finalizer."""
+    x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & MASK
+    x = (x ^ (x >> 27)) * 0x94D049BB133111EB & MASK
+    return x ^ (x >> 31)
+
+
+@cache
+def item_key(item_id: int) -> int:
+    return _mix((item_id + 1) * 0x9E3779B97F4A7C15 & MASK)
+
+
+def bin_hash(key: int) -> int:
+    """Contribution of a bin to the fingerprint, empty bins (key 0) do not count."""
+    return _mix(key) if key else 0
+
+
+def solution_hash(solution) -> int:
+    """Full computation, O(bins)."""
+    return sum(bin_hash(bin.key) for bin in solution) & MASK
+
+
+class LRUMemo:
+    """Bounded mapping, the least recently used entry is dropped when full."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return self._entries.__len__()
+
+    def get(self, key):
+        """Value of key, or None."""
+        try:
+            self._entries.move_to_end(key)
+        except KeyError:
+            return None
+        return self._entries[key]
+
+    def put(self, key, value) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
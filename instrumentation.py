@@ -0,0 +1,26 @@
+"""Counters of where a VNS run spends its time budget.
+
+Disabled unless a SearchStats is given to the VNS, so the hot paths only pay a None check.
+"""
+
+from dataclasses import dataclass, field
+
+
+@dataclass
+class SearchStats:
+    moves_generated: int = 0    # candidate moves drawn by shake or listed by local search
+    moves_evaluated: int = 0    # fitness deltas computed
+    improvements: int = 0       # improving moves applied by local search
+    accepted: int = 0           # neighbours accepted by VNS
+    restarts: int = 0           # times every neighbourhood up to k_max failed
+    memo_hits: int = 0          # local searches replayed from the memo instead of run
+    steps_per_k: dict[int, int] = field(default_factory=dict)
+    time_per_k: dict[int, float] = field(default_factory=dict)
+    time_per_phase: dict[str, float] = field(default_factory=dict)
+
+    def add_step(self, k: int, seconds: float) -> None:
+        self.steps_per_k[k] = self.steps_per_k.get(k, 0) + 1
+        self.time_per_k[k] = self.time_per_k.get(k, 0.0) + seconds
+
+    def add_phase(self, phase: str, seconds: float) -> None:
+        self.time_per_phase[phase] = self.time_per_phase.get(phase, 0.0) + seconds
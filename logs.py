@@ -15,18 +15,48 @@ FORMAT = (
     '<level>{message}</level>'
 )
 
+# Whether each level is enabled, so hot paths can skip building messages with a plain
+# `if logs.TRACE:` check. Kept up to date by config() and silence().
+TRACE = False
+DEBUG = True    # loguru default handler level
+INFO = True
+
 
 def config(level):
     """Levels = 'TRACE', 'DEBUG', 'INFO', 'SUCCESS', 'WARNING', 'ERROR', 'CRITICAL'."""
     logger.remove()
     logger.add(sys.stderr, level=level, format=FORMAT)
     logger.configure(extra={"classname": "None"})
+    _set_levels(logger.level(level).no)
+
+
+def silence():
+    """Silent mode for benchmarks and batch runs: no handlers, every level check is False."""
+    logger.remove()
+    _set_levels(float('inf'))
+
+
+def _set_levels(minimum) -> None:
+    global TRACE, DEBUG, INFO
+    TRACE = logger.level('TRACE').no >= minimum
+    DEBUG = logger.level('DEBUG').no >= minimum
+    INFO = logger.level('INFO').no >= minimum
+
+
+class _ClassLogger:
+    """Logger bound to the class name, created once per class instead of on every access."""
+
+    def __init__(self) -> None:
+        self._loggers = {}
+
+    def __get__(self, instance, owner):
+        try:
+            return self._loggers[owner]
+        except KeyError:
+            return self._loggers.setdefault(owner, logger.bind(classname=owner.__name__))
 
 
 def append_logger(cls):
     """Adds self.logger access from inside a class, otherwise class name won't be printed."""
-
-    def _logger(self):
-        return logger.bind(classname=self.__class__.__name__)
-    cls.logger = property(_logger)
+    cls.logger = _ClassLogger()
     return cls
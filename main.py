@@ -3,7 +3,6 @@
 #     raise RuntimeError("This package requres Python 3.5+")
 
 import random
-import concurrent.futures
 
 from draw import plot
 
@@ -13,6 +12,7 @@ import optimization
 import vns
 import files
 import results
+import scheduler
 import utils
 
 import logs
@@ -42,7 +42,9 @@ if __name__ == "__main__":
             approximation.NullAlgorithm,
             approximation.NextFitAlgorithm,
             approximation.FirstFitAlgorithm,
-            # approximation.FirstFitDecreasingAlgorithm,
+            approximation.BestFitAlgorithm,
+            approximation.FirstFitDecreasingAlgorithm,
+            approximation.BestFitDecreasingAlgorithm,
         ):
             alg = algorithm(test_instance)
             sol = alg.solve()
@@ -86,32 +88,32 @@ if __name__ == "__main__":
 
         t_max = 60
 
-        def process_instance(instance):
-            logbook = []
-            ins = bpp.BPInstance.from_reader(instance)
-            aprox = approximation.FirstFitAlgorithm(ins).solve()
-            explorer = optimization.BPSolutionExplorer(ins, aprox)
+        # Each experiment is an independent task, see scheduler
+        tasks = [
+            scheduler.Task(instance.path, instance.number_of_items,
+                           algorithm, strategy, k_max, t_max)
+            for instance in files.Instances.falkenauer()
             for algorithm, strategy in (
                 (vns.ReducedVNS, None),
                 (vns.BasicVNS, vns.LocalSearchStrategy.BEST),
                 (vns.BasicVNS, vns.LocalSearchStrategy.FIRST),
-            ):
-                for k_max in K_MAX:
-                    # plot(aprox)
-                    # utils.ask_continue()
-                    alg = algorithm(explorer, k_max, t_max, strategy)
-                    alg.solve()
-
-                    experiment = results.Experiment.from_algorithm(alg)
-                    logs.logger.info(experiment)
-                    logbook.append(experiment)
-                    # logs.logger.info(f"{len(results.logbook)}")
-            return logbook
+            )
+            for k_max in K_MAX
+        ]
+
+        # Experiments finished by a previous, interrupted run are not repeated
+        done = results.completed_keys(results.falkenauer_jsonl_file)
+        if done:
+            logs.logger.info(f"Resuming, {len(done)} experiments already done")
+        tasks = [task for task in tasks if task.key not in done]
+
+        workers = int(input("Number of worker processes (default=all cores): ") or 0) or None
 
         # Multiprocessing for faster execution
-        with concurrent.futures.ProcessPoolExecutor() as executor:
-            files = files.Instances.falkenauer()
-            for experiments in executor.map(process_instance, files):
-                results.logbook.extend(experiments)
-                logs.logger.success(f"Total experiments={len(results.logbook)}")
-                results.save_logbook(results.falkenauer_file)
+        for experiment in scheduler.Scheduler(workers).run(tasks):
+            logs.logger.info(experiment)
+            # Streamed as they finish, instead of rewriting the whole logbook every time
+            results.append_experiment(experiment, results.falkenauer_jsonl_file)
+
+        if utils.ask_yes_or_no(f"Export {results.falkenauer_jsonl_file} to Excel?"):
+            results.export_excel(results.falkenauer_jsonl_file, results.falkenauer_file)
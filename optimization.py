@@ -1,17 +1,28 @@
 from __future__ import annotations
-from typing import Iterator
-from dataclasses import dataclass
-from copy import deepcopy
+from typing import ClassVar, Iterator, NamedTuple
+from dataclasses import dataclass, field
+from copy import copy, deepcopy
+from bisect import bisect_left, bisect_right
+from itertools import combinations
+from math import fsum, isclose
+from operator import itemgetter
 import random
+import time
+
+import numpy as np
 
 import vns
 import bpp
+import evaluation
+import hashing
+import logs
 
 
-@dataclass(frozen=True, slots=True)
-class Transfer:
+class Transfer(NamedTuple):
+    """Item `item_id` (its index in the instance) goes from one bin to another.
+    A plain tuple of ints, cheap to hash and compare."""
     bin_from_index: int
-    item: int
+    item_id: int
     bin_to_index: int
 
     @classmethod
@@ -19,47 +30,59 @@ class Transfer:
         """Returns the opposite Transfer that would undo `t`"""
         return cls(
             t.bin_to_index,
-            t.item,
+            t.item_id,
             t.bin_from_index
         )
 
 
-@dataclass(frozen=True, eq=True)
-class Move:
-    """A Move is a sequence of transfers."""
-    transfers: frozenset[Transfer]
+class Move(tuple):
+    """A Move is a sequence of transfers.
+    A tuple itself, sorted so equal moves are equal regardless of the order transfers are
+    given in. Millions are created and discarded while searching, and a plain tuple
+    has no instance dict to allocate.
+    """
+    __slots__ = ()
 
-    def __post_init__(self):
-        """Cast self.transfers to a frozenset, allowing instantiating class with any iterable."""
-        # https://docs.python.org/3/library/dataclasses.html#frozen-instances
-        object.__setattr__(self, 'transfers', frozenset(self.transfers))
+    def __new__(cls, transfers=()):
+        """Allows instantiating class with any iterable."""
+        return tuple.__new__(cls, sorted(transfers))
 
-    def __iter__(self):
-        return self.transfers.__iter__()
+    def __repr__(self):
+        return f"{self.__class__.__name__}(transfers={tuple.__repr__(self)})"
 
-    def __len__(self):
-        return self.transfers.__len__()
+    @property
+    def transfers(self) -> tuple[Transfer, ...]:
+        return tuple(self)
 
     @classmethod
-    def from_transfer(cls, bin_from_index: int, item: float, bin_to_index: int) -> Move:
-        transfers = {Transfer(bin_from_index, item, bin_to_index)}
-        return cls(transfers)
+    def from_transfer(cls, bin_from_index: int, item_id: int, bin_to_index: int) -> Move:
+        return tuple.__new__(cls, (Transfer(bin_from_index, item_id, bin_to_index),))
 
     @classmethod
     def from_swap(cls,
-                  bin_first_index: int, item_first: float,
-                  bin_second_index: int, item_second: float
+                  bin_first_index: int, item_first: int,
+                  bin_second_index: int, item_second: int
                   ) -> Move:
-        """A swap is compossed of two transfers."""
+        """A swap is compossed of two transfers, already sorted when first bin is lower."""
+        transfers = (Transfer(bin_first_index, item_first, bin_second_index),
+                     Transfer(bin_second_index, item_second, bin_first_index))
+        if bin_first_index > bin_second_index:
+            transfers = transfers[::-1]
+        return tuple.__new__(cls, transfers)
 
-        transfers = {Transfer(bin_first_index, item_first, bin_second_index),
-                     Transfer(bin_second_index, item_second, bin_first_index)}
-        return cls(transfers)
+    @classmethod
+    def from_group_swap(cls,
+                        bin_first_index: int, items_first: tuple[int, ...],
+                        bin_second_index: int, items_second: tuple[int, ...]
+                        ) -> Move:
+        """Compound swap, every item of each group goes to the other bin."""
+        return cls([Transfer(bin_first_index, item, bin_second_index) for item in items_first] +
+                   [Transfer(bin_second_index, item, bin_first_index) for item in items_second])
 
     @classmethod
     def reversed(cls, m: Move) -> Move:
         """Returns the opposite Move that would undo `m`"""
-        return cls({Transfer.reversed(t) for t in m.transfers})
+        return cls([Transfer.reversed(t) for t in m])
 
 
 @dataclass
@@ -68,13 +91,62 @@ class BPSolutionExplorer(vns.NeighbourhoodExplorer):
     instance: bpp.BPInstance
     solution: bpp.BPSolution
 
+    # Running fitness, updated by do_move with the delta of each move
+    _fitness: float = field(init=False, repr=False)
+
+    # Running fingerprint of the solution, updated by do_move, see hashing
+    _hash: int = field(init=False, repr=False)
+
+    # Local searches already done: (fingerprint, strategy, group swaps) -> moves applied.
+    # Shared between an explorer and its trials.
+    memo: hashing.LRUMemo = field(init=False, repr=False)
+
+    # Moves applied since last commit(), with the indices of the bins they emptied.
+    # Shared between an explorer and its trials, so any of them can roll back.
+    journal: list[tuple[Move, list[int]]] = field(default_factory=list, init=False, repr=False)
+
+    # (biggest gap, size of the biggest swap window with it), see _max_swap_window
+    _max_window: tuple[float, int] | None = field(default=None, init=False, repr=False)
+
+    # Debug mode: compare the running fitness and fingerprint with a full recompute
+    # after every move
+    check_fitness: ClassVar[bool] = False
+
+    # Deltas up to this fraction of bin_size**2 are rounding errors of float weights,
+    # not improvements. Integer deltas are at least 2, far above it.
+    improvement_tolerance: ClassVar[float] = 1e-12
+
+    # Local searches kept in memo, 0 disables it
+    memo_size: ClassVar[int] = 1000
+
+    # Candidates drawn by random_move() before falling back to full enumeration
+    sample_attempts: ClassVar[int] = 100
+
+    # Compound swaps (items leaving the first bin, items leaving the second bin),
+    # and the VNS level k from which shake and improve use each of them
+    group_swaps: ClassVar[dict[tuple[int, int], int]] = {(1, 2): 2, (2, 1): 2, (2, 2): 3}
+
+    def __post_init__(self):
+        self._fitness = self.compute_fitness()
+        self._hash = hashing.solution_hash(self.solution)
+        self.memo = hashing.LRUMemo(self.memo_size)
+
     @property
     def fitness(self) -> float:
         """A good solution will always have nearly full bins.
         fitness = sum of squared occupancy.
         """
+        return self._fitness
+
+    def compute_fitness(self) -> float:
+        """Full recomputation of fitness, O(bins)."""
         return sum(bin.content**2 for bin in self.solution)
 
+    @property
+    def fingerprint(self) -> int:
+        """Equal for solutions with the same items in each bin, in any order."""
+        return self._hash
+
     @property
     def is_optimum(self) -> bool:
         return self.instance.lower_bound == len(self.solution.bins)
@@ -85,83 +157,380 @@ class BPSolutionExplorer(vns.NeighbourhoodExplorer):
         Source:
         Fleszar2002 - New heuristics for one-dimensional bin-packing
         """
+        weights = self.instance.items
         if len(move) == 1:  # Transfer
             [transfer] = move   # unpack only transfer from move
             b1 = self.solution[transfer.bin_from_index].content
             b2 = self.solution[transfer.bin_to_index].content
-            it = transfer.item
+            it = weights[transfer.item_id]
             return (b1-it)**2 + (b2+it)**2 - b1**2 - b2**2
 
-        else:               # Swap
+        elif len(move) == 2:    # Swap
             [trans1, trans2] = move
             b1 = self.solution[trans1.bin_from_index].content
-            i1 = trans1.item
+            i1 = weights[trans1.item_id]
             b2 = self.solution[trans2.bin_from_index].content
-            i2 = trans2.item
+            i2 = weights[trans2.item_id]
             return (b1 - i1 + i2)**2 + (b2 + i1 - i2)**2 - b1**2 - b2**2
 
+        else:               # Group swap, net weight change of every bin involved
+            changes = {}
+            for t in move:
+                changes[t.bin_from_index] = changes.get(t.bin_from_index, 0) - weights[t.item_id]
+                changes[t.bin_to_index] = changes.get(t.bin_to_index, 0) + weights[t.item_id]
+            return sum((self.solution[bin_index].content + change)**2 -
+                       self.solution[bin_index].content**2
+                       for bin_index, change in changes.items())
+
     def shake(self, k_neighbourhood: int) -> BPSolutionExplorer:
-        """This could be improved with better termination conditions from paper Fleszar2002.
-        Furthermore, if random choice were made in possible_moves(), there would be no need
-        to generate all moves.
-        """
-        self.logger.debug(f"SHAKING... {k_neighbourhood=}")
-        new_solution = self.copy()
+        """Apply k random moves, each one drawn directly by random_move(),
+        or by random_group_swap() for the group swaps enabled at this level."""
+        if logs.DEBUG:
+            self.logger.debug(f"SHAKING... {k_neighbourhood=}")
+        start = time.perf_counter()
+        new_solution = self.trial()
 
         # Save applied moves to avoid looping back to the same solution
         moves_applied_reversed = set()
+        neighbourhoods = [None, *self.group_swaps_at(k_neighbourhood)]
 
         # Each iteration, the neighborhood radio (k) is increased
         for kth in range(k_neighbourhood):
-            moves = [m for m in new_solution.possible_moves()
-                     # Only chose between moves that won't undo previous moves
-                     if m not in moves_applied_reversed]
+            if new_solution.expired:
+                if logs.TRACE:
+                    self.logger.trace("Timed out while shaking. Returning neighbour so far.")
+                break
+
+            # Only chose between moves that won't undo previous moves
+            sizes = random.choice(neighbourhoods) if len(neighbourhoods) > 1 else None
+            move = None
+            if sizes is not None:
+                move = new_solution.random_group_swap(sizes, excluded=moves_applied_reversed)
+            if move is None:
+                move = new_solution.random_move(excluded=moves_applied_reversed)
 
-            self.logger.trace(f"{kth=}\t{len(moves)=}")
+            if logs.TRACE:
+                self.logger.trace(f"{kth=}\t{move=}")
 
-            if len(moves) == 0:
+            if move is None:
                 # Deadend, no more moves to apply
                 break
-            move = random.choice(moves)
 
             new_solution.do_move(move)
             moves_applied_reversed.add(Move.reversed(move))
 
+        if self.counters is not None:
+            self.counters.add_phase('shake', time.perf_counter() - start)
         return new_solution
 
-    def improve(self, strategy: vns.LocalSearchStrategy) -> BPSolutionExplorer:
-        """Stop iterating when improvement is no longer possible."""
-        self.logger.debug(f"IMPROVING...  {strategy.name=}")
-        new_solution = self.copy()
-
-        try:    # If timed out, return the best solution so far
-            while True:
-                moves = new_solution.possible_moves(skip_full_bins=True)
-
-                if strategy == vns.LocalSearchStrategy.BEST:
-                    best_move = max(moves, key=new_solution.delta_fitness_from_move,
-                                    default=None)
-
-                elif strategy == vns.LocalSearchStrategy.FIRST:
-                    best_move = next((m for m in moves
-                                      if new_solution.delta_fitness_from_move(m) > 0),
-                                     None)  # default
-                # 0/0
-                if (best_move is None) or (new_solution.delta_fitness_from_move(best_move) <= 0):
+    def random_move(self, excluded: set[Move] = frozenset()) -> Move | None:
+        """Uniformly random move from possible_moves(), not in `excluded`.
+        Rejection sampling over candidates that are mostly feasible by construction:
+        a transfer is a random item and a random bin where it fits, a swap a random item and
+        another one from the window of weights it could be swapped with (see _swap_window).
+        Each candidate is kept in proportion to the number of choices it was drawn from,
+        so every feasible move is equally likely. Only when too many candidates are rejected
+        every move is enumerated, to tell a dead end from bad luck.
+        """
+        weights = self.instance.items
+        n_items = len(weights)
+        if n_items == 0:
+            return None
+        # Most bins any item fits in (those of the lightest one), and most swap partners
+        max_fitting = self.solution.count_fitting(weights[self.instance.ids_by_weight[0]])
+        max_window = self._max_swap_window()
+
+        for attempt in range(1, self.sample_attempts + 1):
+            item_id = random.randrange(n_items)
+            bin_from_index = self.solution.bin_of(item_id)
+
+            # Each transfer is one of n_items * max_fitting candidates. Each swap is two of
+            # n_items * max_window candidates, as either of its items can be drawn first.
+            if random.randrange(2 * max_fitting + max_window) < 2 * max_fitting:   # Transfer
+                if random.randrange(max_fitting) >= self.solution.count_fitting(weights[item_id]):
+                    continue
+                bin_to_index = self.solution.random_fitting(weights[item_id])
+                if bin_to_index == bin_from_index:
+                    continue
+                move = Move.from_transfer(bin_from_index, item_id, bin_to_index)
+
+            else:                                                                   # Swap
+                lighter, heavier = self._swap_window(item_id, bin_from_index)
+                position = random.randrange(max_window)
+                if position >= len(lighter) + len(heavier):
+                    continue
+                partner = self.instance.ids_by_weight[
+                    lighter[position] if position < len(lighter)
+                    else heavier[position - len(lighter)]]
+                bin_second_index = self.solution.bin_of(partner)
+                # Same conditions as possible_swaps(), the window already checks the first bin
+                if (bin_from_index == bin_second_index or
+                        not self.solution[bin_second_index].fits(weights[item_id] -
+                                                                 weights[partner])):
+                    continue
+                move = Move.from_swap(bin_from_index, item_id, bin_second_index, partner)
+
+            if move not in excluded:
+                if self.counters is not None:
+                    self.counters.moves_generated += attempt
+                return move
+
+        moves = [m for m in self.possible_moves() if m not in excluded]
+        if self.counters is not None:
+            self.counters.moves_generated += self.sample_attempts + len(moves)
+        return random.choice(moves) if moves else None
+
+    def _max_swap_window(self) -> int:
+        """Upper bound of the size of every _swap_window(), taking the biggest gap on both
+        sides. Only computed again when the biggest gap changes."""
+        gap = self.solution.max_gap
+        if self._max_window is None or self._max_window[0] != gap:
+            weights = np.sort(np.asarray(self.instance.items))
+            lighter = (np.searchsorted(weights, weights, 'left') -
+                       np.searchsorted(weights, weights - gap, 'left'))
+            heavier = (np.searchsorted(weights, weights + gap, 'right') -
+                       np.searchsorted(weights, weights, 'right'))
+            self._max_window = (gap, max(1, int((lighter + heavier).max())))
+        return self._max_window[1]
+
+    def _swap_window(self, item_id: int, bin_index: int) -> tuple[range, range]:
+        """Positions in instance.ids_by_weight of the items lighter and heavier than item_id
+        that could be swapped with it. The weight w of the other item must fit in bin_index
+        once item leaves: w <= item + gap, and item must fit in the other bin: w >= item - its
+        gap, which is at most the biggest gap of all. Equal weights are never swapped.
+        """
+        weights = self.instance.items
+        by_weight = self.instance.ids_by_weight
+        item = weights[item_id]
+        low = bisect_left(by_weight, item - self.solution.max_gap, key=weights.__getitem__)
+        high = bisect_right(by_weight, item + self.solution[bin_index].gap,
+                            key=weights.__getitem__)
+        equal_low = bisect_left(by_weight, item, low, high, key=weights.__getitem__)
+        equal_high = bisect_right(by_weight, item, equal_low, high, key=weights.__getitem__)
+        return range(low, equal_low), range(equal_high, high)
+
+    def group_swaps_at(self, k: int) -> list[tuple[int, int]]:
+        """Group swaps enabled at VNS level k, see group_swaps."""
+        return [sizes for sizes, level in self.group_swaps.items() if k >= level]
+
+    def random_group_swap(self, sizes: tuple[int, int],
+                          excluded: set[Move] = frozenset()) -> Move | None:
+        """Random feasible swap of sizes[0] items of one bin with sizes[1] items of another,
+        by rejection sampling. None if no candidate was feasible.
+        Two full bins can only swap equal weights, so one of the bins is drawn among the others.
+        """
+        n_bins = len(self.solution)
+        if n_bins < 2:
+            return None
+        for attempt in range(1, self.sample_attempts + 1):
+            bin_first_index = self.solution.random_open_bin()
+            if bin_first_index is None:
+                break
+            bin_second_index = random.randrange(n_bins - 1)
+            bin_second_index += bin_second_index >= bin_first_index
+            if random.random() < 0.5:
+                bin_first_index, bin_second_index = bin_second_index, bin_first_index
+            bin_first = self.solution[bin_first_index]
+            bin_second = self.solution[bin_second_index]
+            if len(bin_first) < sizes[0] or len(bin_second) < sizes[1]:
+                continue
+            items_first = random.sample(bin_first.ids, sizes[0])
+            items_second = random.sample(bin_second.ids, sizes[1])
+            weights = self.instance.items
+            gained = (sum(weights[item_id] for item_id in items_second) -   # by first bin
+                      sum(weights[item_id] for item_id in items_first))
+            if gained == 0 or not bin_first.fits(gained) or not bin_second.fits(-gained):
+                continue
+            move = Move.from_group_swap(bin_first_index, items_first,
+                                        bin_second_index, items_second)
+            if move not in excluded:
+                if self.counters is not None:
+                    self.counters.moves_generated += attempt
+                return move
+
+        if self.counters is not None:
+            self.counters.moves_generated += self.sample_attempts
+        return None
+
+    def improve(self, strategy: vns.LocalSearchStrategy, k: int = 1) -> BPSolutionExplorer:
+        """Stop iterating when improvement is no longer possible.
+        Deltas are cached per pair of bins, see evaluation.BinPairCache, so each step
+        only evaluates again the moves involving the two bins changed by the last one.
+        Group swaps enabled at level k are only searched when no transfer or swap improves.
+        """
+        if logs.DEBUG:
+            self.logger.debug(f"IMPROVING...  {strategy.name=}")
+        start = time.perf_counter()
+        new_solution = self.trial()
+        cache, changed_bins, emptied_bins = None, (), ()
+
+        # The same solution was already improved: replay the moves instead of searching.
+        # Not with FIRST_RANDOM, whose point is not repeating itself.
+        memo_key = None
+        if self.memo_size and strategy != vns.LocalSearchStrategy.FIRST_RANDOM:
+            memo_key = (self._hash, strategy, tuple(self.group_swaps_at(k)))
+            relocations = self.memo.get(memo_key)
+            if relocations is not None:
+                new_solution.replay(relocations)
+                if self.counters is not None:
+                    self.counters.memo_hits += 1
+                    self.counters.add_phase('improve', time.perf_counter() - start)
+                return new_solution
+        relocations = [] if memo_key is not None else None
+
+        tolerance = self.improvement_tolerance * self.instance.bin_size**2
+        # Between moves the solution is always consistent, stop there if timed out
+        while not new_solution.expired:
+            weights, assignment, loads, ids = new_solution.solution.as_arrays()
+            if cache is None:
+                shuffle = strategy == vns.LocalSearchStrategy.FIRST_RANDOM
+                cache = evaluation.BinPairCache(weights, assignment, loads,
+                                                self.instance.bin_size, skip_full_bins=True,
+                                                counters=self.counters, shuffle=shuffle)
+            else:
+                cache.update(weights, assignment, loads, changed_bins, emptied_bins)
+
+            if strategy == vns.LocalSearchStrategy.BEST:
+                candidate = cache.best()
+
+            elif strategy == vns.LocalSearchStrategy.FIRST:
+                candidate = cache.first(tolerance)
+
+            else:   # FIRST_CIRCULAR or FIRST_RANDOM
+                candidate = cache.next_improving(tolerance)
+
+            if (candidate is not None) and (candidate.delta > tolerance):
+                best_move = self._move_from_candidate(candidate, assignment, ids)
+            else:
+                best_move, _ = new_solution.best_group_swap(
+                    self.group_swaps_at(k), first=strategy != vns.LocalSearchStrategy.BEST)
+            # 0/0
+            if best_move is None:
+                if logs.TRACE:
                     self.logger.trace("No improvement found.")
-                    break
+                break
 
+            if logs.TRACE:
                 self.logger.trace("Improvement found!")
-                new_solution.do_move(best_move)
+            if relocations is not None:
+                relocation = new_solution.relocation(best_move)
+                if relocation is None:
+                    relocations = None  # Cannot be replayed
+                else:
+                    relocations.append(relocation)
+            new_solution.do_move(best_move)
+            changed_bins = {index for t in best_move
+                            for index in (t.bin_from_index, t.bin_to_index)}
+            _, emptied_bins = new_solution.journal[-1]
+            if self.counters is not None:
+                self.counters.improvements += 1
+            if logs.TRACE:
                 self.logger.trace(f"{new_solution.stats}")
-                # plot(new_solution.solution)
+            # plot(new_solution.solution)
+
+        else:
+            if logs.TRACE:
+                self.logger.trace("Timed out while improving. Returning best solution so far.")
+            relocations = None   # Unfinished, not worth remembering
 
-        except TimeoutError:
-            self.logger.trace("Timed out while improving. Returning best solution so far.")
-            return new_solution
+        if memo_key is not None and relocations is not None:
+            self.memo.put(memo_key, tuple(relocations))
 
+        if self.counters is not None:
+            self.counters.add_phase('improve', time.perf_counter() - start)
         return new_solution
 
+    def best_move(self, skip_full_bins: bool = False) -> tuple[Move | None, float]:
+        """Scores every transfer and swap at once, see evaluation module.
+        Same result as max(possible_moves(), key=delta_fitness_from_move).
+        """
+        weights, assignment, loads, ids = self.solution.as_arrays()
+        best = evaluation.best_move(weights, assignment, loads,
+                                    self.instance.bin_size, skip_full_bins, self.counters)
+        if best is None:
+            return None, 0
+        return self._move_from_candidate(best, assignment, ids), best.delta
+
+    @staticmethod
+    def _move_from_candidate(candidate: evaluation.Candidate, assignment, ids) -> Move:
+        """Move described by a candidate over the arrays of as_arrays()."""
+        item_first = int(ids[candidate.first])
+        bin_first_index = int(assignment[candidate.first])
+        if candidate.is_swap:
+            return Move.from_swap(bin_first_index, item_first,
+                                  int(assignment[candidate.second]), int(ids[candidate.second]))
+        return Move.from_transfer(bin_first_index, item_first, candidate.second)
+
+    def best_group_swap(self, sizes: list[tuple[int, int]],
+                        first: bool = False) -> tuple[Move | None, float]:
+        """Best improving swap of groups of items between two bins, for every (k, l) in `sizes`
+        k items leave the first bin and l items the second one. With `first`, the first
+        improving swap found instead. None when no group swap improves.
+        """
+        if not sizes:
+            return None, 0
+        swaps = self._improving_group_swaps(sizes)
+        found = next(swaps, None) if first else max(swaps, key=itemgetter(0), default=None)
+        swaps.close()
+        if found is None:
+            return None, 0
+        delta, *groups = found
+        return Move.from_group_swap(*groups), delta
+
+    def _improving_group_swaps(self, sizes: list[tuple[int, int]]) -> Iterator[tuple]:
+        """(delta, bin a, items leaving a, bin b, items leaving b) of improving group swaps.
+
+        Only swaps where a gains weight d > 0 are searched, the others are found with the
+        bins the other way around. Fitness changes by 2d(La - Lb + d), which grows with d
+        when it improves, so for each group leaving a only the heaviest group of b that
+        still fits in a needs checking: a bisection over the sorted sums of b's groups.
+        """
+        groups = {size: [self._groups(bin, size) for bin in self.solution]
+                  for size in {size for pair in sizes for size in pair}}
+        sums = {size: [[total for total, _ in bin_groups] for bin_groups in groups[size]]
+                for size in groups}
+        # Exact sums like the group totals, so a swap of whole bins gains exactly their difference
+        loads = [fsum(bin) for bin in self.solution]
+        tolerance = self.improvement_tolerance * self.instance.bin_size**2
+
+        evaluated = 0
+        try:
+            for a, bin_a in enumerate(self.solution):
+                if bin_a.is_full:
+                    continue
+                for b, bin_b in enumerate(self.solution):
+                    # A full bin b can only lose weight, and bin a could not take enough of it
+                    if a == b or bin_b.is_full:
+                        continue
+                    min_gained = max(0, loads[b] - loads[a])
+                    gap_a = self.instance.bin_size - loads[a]
+                    for size_a, size_b in sizes:
+                        # Swapping whole contents only exchanges the bins
+                        if size_a == len(bin_a) and size_b == len(bin_b):
+                            continue
+                        totals_b = sums[size_b][b]
+                        for total_a, items_a in groups[size_a][a]:
+                            evaluated += 1
+                            i = bisect_right(totals_b, total_a + gap_a) - 1
+                            if i < 0 or totals_b[i] - total_a <= min_gained:
+                                continue
+                            gained = totals_b[i] - total_a
+                            delta = 2 * gained * (loads[a] - loads[b] + gained)
+                            if delta > tolerance:
+                                yield delta, a, items_a, b, groups[size_b][b][i][1]
+        finally:
+            if self.counters is not None:
+                self.counters.moves_generated += evaluated
+                self.counters.moves_evaluated += evaluated
+
+    def _groups(self, bin: bpp.Bin, size: int) -> list[tuple[float, tuple[int, ...]]]:
+        """Every group of `size` item ids of bin with its total weight, sorted by it.
+        Only one group is kept for each total, they are all the same to a group swap."""
+        weights = self.instance.items
+        unique = {fsum(weights[item_id] for item_id in group): group
+                  for group in combinations(bin.ids, size)}
+        return sorted(unique.items())
+
     def possible_moves(self, skip_full_bins: bool = False) -> Iterator[Move]:
         """When in an improvement phase, full bins are skiped as they do not increase fitness."""
         yield from self.possible_transfers(skip_full_bins)
@@ -174,23 +543,24 @@ class BPSolutionExplorer(vns.NeighbourhoodExplorer):
             if skip_full_bins and bin_from.is_full:   # Skip full bins when needed
                 continue
 
-            for item in bin_from:
-                for bin_to_index, bin_to in enumerate(self.solution):
+            for item_id in bin_from.ids:
+                # Only bins that can receive the item, see gap_index
+                for bin_to_index in self.solution.bins_fitting(self.instance.items[item_id]):
 
                     if bin_from_index == bin_to_index:  # Do not transfer to same bin
                         continue
 
-                    if bin_to.fits(item):
-                        yield Move.from_transfer(bin_from_index, item, bin_to_index)
+                    yield Move.from_transfer(bin_from_index, item_id, bin_to_index)
 
     def possible_swaps(self, skip_full_bins: bool) -> Iterator[Move]:
         """Enumerates exhaustively every possible swap, without repetition."""
+        weights = self.instance.items
         for bin_first_index, bin_first in enumerate(self.solution):
 
             if (skip_full_bins and bin_first.is_full):   # Skip full bins when needed
                 continue
 
-            for item_first in bin_first:
+            for item_first in bin_first.ids:
                 for bin_second_index, bin_second in enumerate(self.solution):
 
                     if skip_full_bins and bin_second.is_full:   # Skip full bins when needed
@@ -200,31 +570,95 @@ class BPSolutionExplorer(vns.NeighbourhoodExplorer):
                     if bin_first_index >= bin_second_index:
                         continue
 
-                    for item_second in bin_second:
+                    for item_second in bin_second.ids:
+                        diff = weights[item_second] - weights[item_first]
 
-                        if item_first == item_second:   # Do not swap equal items
+                        if diff == 0:   # Swapping equal weights changes nothing
                             continue
 
                         if (    # Swap is possible: both items would fit without the other
-                            bin_first.fits(item_second - item_first) and
-                            bin_second.fits(item_first - item_second)
+                            bin_first.fits(diff) and
+                            bin_second.fits(-diff)
                         ):
 
                             yield Move.from_swap(bin_first_index, item_first,
                                                  bin_second_index, item_second)
 
+    def relocation(self, move: Move) -> tuple[tuple[int, int], ...] | None:
+        """Move independent of bin indices: each item with another item (an anchor) that
+        is in its destination bin before the move. None if a destination bin is empty."""
+        destinations = [self.solution[t.bin_to_index].ids for t in move]
+        if not all(destinations):
+            return None
+        return tuple((t.item_id, ids[0]) for t, ids in zip(move, destinations))
+
+    def replay(self, relocations: list[tuple[tuple[int, int], ...]]) -> BPSolutionExplorer:
+        """Apply moves recorded by relocation(), INPLACE, on a solution with the same bins."""
+        where = {item_id: index for index, bin in enumerate(self.solution) for item_id in bin.ids}
+        for relocation in relocations:
+            move = Move([Transfer(where[item_id], item_id, where[anchor])
+                         for item_id, anchor in relocation])
+            self.do_move(move)
+            for t in move:
+                where[t.item_id] = t.bin_to_index
+            _, emptied = self.journal[-1]
+            for removed in reversed(emptied):
+                for item_id, index in where.items():
+                    if index > removed:
+                        where[item_id] = index - 1
+        return self
+
     def do_move(self, move) -> BPSolutionExplorer:
         """Perform move on solution INPLACE, returns self for convinience."""
+        delta = self.delta_fitness_from_move(move)
+        bins = {index for t in move for index in (t.bin_from_index, t.bin_to_index)}
+        self._hash -= sum(hashing.bin_hash(self.solution[index].key) for index in bins)
         for transfer in move:
             self.solution.move_item(transfer.bin_from_index,
-                                    transfer.item,
+                                    transfer.item_id,
                                     transfer.bin_to_index)
-        self.solution.remove_empty_bins()
+        self._hash += sum(hashing.bin_hash(self.solution[index].key) for index in bins)
+        self._hash &= hashing.MASK
+        emptied = sorted({t.bin_from_index for t in move
+                          if self.solution[t.bin_from_index].is_empty})
+        if emptied:     # O(bins)
+            self.solution.remove_empty_bins()
+        self._fitness += delta
+        self.journal.append((move, emptied))
+
+        if self.check_fitness:
+            fitness = self.compute_fitness()
+            assert isclose(self._fitness, fitness), f"Fitness drift: {self._fitness} != {fitness}"
+            assert self._hash == hashing.solution_hash(self.solution), "Fingerprint drift"
         return self
 
     def copy(self):
         return deepcopy(self)
 
+    def trial(self) -> BPSolutionExplorer:
+        """Cheap alternative to copy(): the new explorer shares solution and journal with self.
+        Its moves modify the shared solution, so it must end with commit() (keep them)
+        or rollback() (undo them, restoring the solution self describes).
+        """
+        return copy(self)
+
+    def commit(self) -> None:
+        """Make the moves applied so far permanent."""
+        self.journal.clear()
+
+    def rollback(self) -> None:
+        """Undo every move applied since last commit(), newest first.
+        Only the explorer the moves started from is valid afterwards.
+        """
+        while self.journal:
+            move, emptied = self.journal.pop()
+            for bin_index in emptied:
+                self.solution.insert_empty_bin(bin_index)
+            for transfer in Move.reversed(move):
+                self.solution.move_item(transfer.bin_from_index,
+                                        transfer.item_id,
+                                        transfer.bin_to_index)
+
     @property
     def stats(self):
         return f"Bins={len(self.solution)}(min={self.instance.lower_bound}) Fitness={self.fitness}"
@@ -0,0 +1,176 @@
+"""Run several VNS variants in parallel on the same instance, sharing the best solution."""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from math import inf
+import multiprocessing
+import random
+import traceback
+
+import approximation
+import bpp
+import files
+import logs
+import optimization
+import vns
+
+
+@dataclass(frozen=True)
+class Variant:
+    """One VNS configuration of the portfolio."""
+    algorithm: type[vns.VNS]
+    k_max: int
+    local_strategy: vns.LocalSearchStrategy = None
+    seed: int = 0
+
+    def __str__(self) -> str:
+        return (f"{self.algorithm.__name__}({getattr(self.local_strategy, 'name', '')})"
+                f"-k{self.k_max}-s{self.seed}")
+
+
+DEFAULT_VARIANTS = (
+    Variant(vns.ReducedVNS, 20, None, 0),
+    Variant(vns.BasicVNS, 10, vns.LocalSearchStrategy.BEST, 1),
+    Variant(vns.BasicVNS, 10, vns.LocalSearchStrategy.FIRST, 2),
+    Variant(vns.BasicVNS, 50, vns.LocalSearchStrategy.BEST, 3),
+)
+
+
+@dataclass
+class PortfolioResult:
+    variant: Variant
+    bins: list[list[float]]
+    fitness: float
+    t: float
+    optimum: bool
+
+
+class SharedIncumbent(vns.Incumbent):
+    """Best solution found by any worker, kept in shared memory.
+    Stored as the id of every item, grouped by bin, plus the length of each bin.
+    """
+
+    def __init__(self, instance: bpp.BPInstance) -> None:
+        self.bin_size = instance.bin_size
+        self.weights = instance.items
+
+        self._lock = multiprocessing.Lock()
+        self._stop = multiprocessing.Event()
+        self._fitness = multiprocessing.RawValue('d', -inf)
+        self._n_bins = multiprocessing.RawValue('i', 0)
+        self._ids = multiprocessing.RawArray('i', len(instance.items))
+        self._bin_lengths = multiprocessing.RawArray('i', len(instance.items))
+
+    def publish(self, explorer: optimization.BPSolutionExplorer) -> None:
+        if explorer.fitness <= self._fitness.value:     # Cheap check before locking
+            return
+        with self._lock:
+            if explorer.fitness <= self._fitness.value:
+                return
+            position = 0
+            for bin_index, bin in enumerate(explorer.solution):
+                ids = bin.ids
+                self._ids[position:position + len(ids)] = ids
+                self._bin_lengths[bin_index] = len(ids)
+                position += len(ids)
+            self._n_bins.value = len(explorer.solution)
+            self._fitness.value = explorer.fitness
+
+    def adopt(self, explorer: optimization.BPSolutionExplorer
+              ) -> optimization.BPSolutionExplorer:
+        if self._fitness.value <= explorer.fitness:
+            return explorer
+        with self._lock:
+            bins = self._read_bins()
+        solution = bpp.BPSolution(self.bin_size, self.weights,
+                                  [bpp.Bin(self.bin_size, self.weights, ids) for ids in bins])
+        solution.remove_empty_bins()
+        return explorer.__class__(explorer.instance, solution)
+
+    def _read_bins(self) -> list[list[int]]:
+        bins, position = [], 0
+        for length in self._bin_lengths[:self._n_bins.value]:
+            bins.append(self._ids[position:position + length])
+            position += length
+        return bins
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+
+def _run_variant(variant: Variant, instance: bpp.BPInstance, solution: bpp.BPSolution,
+                 t_max: float, incumbent: SharedIncumbent, results) -> None:
+    """Worker process entry point.
+    Always puts something in `results`: on failure the traceback, re-raised by Portfolio.solve
+    after stopping the other workers.
+    """
+    try:
+        random.seed(variant.seed)
+        explorer = optimization.BPSolutionExplorer(instance, solution)
+        alg = variant.algorithm(explorer, variant.k_max, t_max, variant.local_strategy,
+                                incumbent)
+        alg.solve()
+    except BaseException:
+        incumbent.stop()
+        # A string, any exception pickles this way
+        results.put(RuntimeError(f"Variant {variant} failed:\n{traceback.format_exc()}"))
+        return
+    results.put(PortfolioResult(
+        variant,
+        [bin.items for bin in alg.explorer.solution],
+        alg.explorer.fitness,
+        alg.timer.elapsed_time,
+        alg.explorer.is_optimum,
+    ))
+
+
+@logs.append_logger
+@dataclass
+class Portfolio:
+    """Every variant runs in its own process, starting from the same solution.
+    Improvements are shared through a SharedIncumbent: a worker adopts it whenever it
+    restarts its neighbourhood search, and all of them stop when one reaches the optimum.
+    """
+    instance: bpp.BPInstance
+    solution: bpp.BPSolution
+    t_max: float
+    variants: tuple[Variant] = DEFAULT_VARIANTS
+
+    def solve(self) -> list[PortfolioResult]:
+        """Results of every variant, best first."""
+        incumbent = SharedIncumbent(self.instance)
+        results = multiprocessing.SimpleQueue()
+        workers = [multiprocessing.Process(target=_run_variant, name=str(variant),
+                                           args=(variant, self.instance, self.solution,
+                                                 self.t_max, incumbent, results))
+                   for variant in self.variants]
+
+        for worker in workers:
+            worker.start()
+        portfolio_results = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        for result in portfolio_results:
+            if isinstance(result, Exception):
+                raise result
+
+        portfolio_results.sort(key=lambda r: (len(r.bins), -r.fitness, r.t))
+        best = portfolio_results[0]
+        self.logger.success(f"Best: {best.variant} Bins={len(best.bins)}"
+                            f"(min={self.instance.lower_bound}) t={best.t:.2f}s")
+        return portfolio_results
+
+
+if __name__ == "__main__":
+    logs.config('INFO')
+    reader = next(files.Instances.hard())
+    instance = bpp.BPInstance.from_reader(reader)
+    solution = approximation.best_solution(instance)
+
+    for result in Portfolio(instance, solution, t_max=60).solve():
+        print(f"{result.variant}\tbins={len(result.bins)}\tt={result.t:.2f}s"
+              f"\toptimum={result.optimum}")
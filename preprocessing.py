@@ -0,0 +1,51 @@
+"""Problem reduction before searching, see bounds.fixed_bins.
+
+Bins fixed by the reduction are part of some optimal solution, so only the items left
+need to be searched: a smaller instance, whose solutions are merged back with the fixed bins.
+"""
+
+from __future__ import annotations
+from collections import defaultdict
+from dataclasses import dataclass
+
+import bounds
+import bpp
+
+
+@dataclass(frozen=True)
+class Reduction:
+    instance: bpp.BPInstance
+    reduced: bpp.BPInstance                     # Items left, to be searched
+    fixed_bins: tuple[tuple[int, ...], ...]     # Ids of the items in each fixed bin
+    ids: tuple[int, ...]                        # Id in instance of each item of reduced
+
+    @classmethod
+    def of(cls, instance: bpp.BPInstance) -> Reduction:
+        bins, _ = bounds.fixed_bins(instance.items, instance.bin_size)
+
+        # Fixed bins are given as weights, any item with the same weight will do
+        ids_by_weight = defaultdict(list)
+        for item_id in reversed(range(len(instance.items))):
+            ids_by_weight[instance.items[item_id]].append(item_id)
+        fixed_bins = tuple(tuple(ids_by_weight[item].pop() for item in bin) for bin in bins)
+
+        # Items left keep their relative order
+        fixed = {item_id for bin in fixed_bins for item_id in bin}
+        ids = tuple(item_id for item_id in range(len(instance.items)) if item_id not in fixed)
+        reduced = bpp.BPInstance(instance.bin_size, [instance.items[item_id] for item_id in ids])
+        if hasattr(instance, 'source'):
+            object.__setattr__(reduced, 'source', instance.source)
+        return cls(instance, reduced, fixed_bins, ids)
+
+    def expand(self, solution: bpp.BPSolution) -> bpp.BPSolution:
+        """Solution of the whole instance: the fixed bins followed by those of `solution`,
+        a solution of the reduced instance."""
+        weights = self.instance.items
+        bins = [bpp.Bin(self.instance.bin_size, weights, list(bin), closed=True)
+                for bin in self.fixed_bins]
+        bins += [bpp.Bin(self.instance.bin_size, weights,
+                         [self.ids[item_id] for item_id in bin.ids])
+                 for bin in solution]
+        expanded = bpp.BPSolution(self.instance.bin_size, weights, bins)
+        expanded.remove_empty_bins()
+        return expanded
@@ -1,10 +1,20 @@
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from pathlib import Path
+import json
+import os
 import pandas as pd
+import instrumentation
+import preprocessing
 import vns
 
-excel_file = Path('output.xls')
-falkenauer_file = Path('output_falkenauer.xls')
+excel_file = Path('output.xlsx')
+falkenauer_file = Path('output_falkenauer.xlsx')
+jsonl_file = Path('output.jsonl')
+falkenauer_jsonl_file = Path('output_falkenauer.jsonl')
+
+
+# Fields identifying an experiment, a resumed batch skips the ones already done
+KEY_FIELDS = ('folder', 'instance', 'algorithm', 'local_search', 'k_max', 't_max')
 
 
 @dataclass
@@ -20,9 +30,11 @@ class Experiment:
     t: float
     bins: int
     optimum: bool
+    search_stats: instrumentation.SearchStats = None
+    fixed_bins: int = 0     # Bins fixed by preprocessing, not searched
 
     @classmethod
-    def from_algorithm(cls, alg: vns.VNS):
+    def from_algorithm(cls, alg: vns.VNS, reduction: preprocessing.Reduction = None):
         return cls(
             str(alg.explorer.instance.source.parent),
             alg.explorer.instance.source.name,
@@ -35,12 +47,61 @@ class Experiment:
             alg.timer.elapsed_time,
             len(alg.explorer.solution.bins),
             alg.explorer.is_optimum,
+            alg.counters,
+            len(reduction.fixed_bins) if reduction else 0,
         )
 
+    @property
+    def key(self) -> tuple:
+        return tuple(getattr(self, field) for field in KEY_FIELDS)
+
 
 logbook = []
 
 
 def save_logbook(file=excel_file):
-    df = pd.DataFrame.from_dict(logbook)
+    # Nested search_stats are flattened into columns like "search_stats.time_per_k.1"
+    df = pd.json_normalize([asdict(experiment) for experiment in logbook])
+    df.to_excel(file)
+
+
+def append_experiment(experiment: Experiment, file=jsonl_file) -> None:
+    """Stream one finished experiment to disk as a JSON line.
+    Each line is synced before returning, so a crash can only lose the line being written.
+    """
+    line = json.dumps(asdict(experiment)) + '\n'
+    with open(file, 'a+b') as f:
+        # A line truncated by a crash is ended first, so this one is not appended to it
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                line = '\n' + line
+        f.write(line.encode())
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def load_experiments(file=jsonl_file) -> list[dict]:
+    """Every experiment streamed to file, skipping a last line truncated by a crash."""
+    if not Path(file).exists():
+        return []
+    experiments = []
+    with open(file) as f:
+        for line in f:
+            try:
+                experiments.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return experiments
+
+
+def completed_keys(file=jsonl_file) -> set[tuple]:
+    """Keys of every experiment already streamed to file, see Experiment.key."""
+    return {tuple(experiment[field] for field in KEY_FIELDS)
+            for experiment in load_experiments(file)}
+
+
+def export_excel(source=jsonl_file, file=excel_file) -> None:
+    """Optional step after a run: convert streamed experiments to a spreadsheet."""
+    df = pd.json_normalize(load_experiments(source))
     df.to_excel(file)
@@ -0,0 +1,84 @@
+"""Run batches of experiments as independent tasks on a process pool."""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+import concurrent.futures
+import os
+
+import approximation
+import bpp
+import files
+import instrumentation
+import logs
+import optimization
+import preprocessing
+import results
+import utils
+import vns
+
+
+@dataclass(frozen=True)
+class Task:
+    """One experiment: a VNS configuration on one instance."""
+    path: Path
+    items: int      # Instance size, bigger tasks are scheduled first
+    algorithm: type[vns.VNS]
+    local_strategy: vns.LocalSearchStrategy
+    k_max: int
+    t_max: float
+    preprocess: bool = True     # Search only the items left by preprocessing.Reduction
+
+    @property
+    def key(self) -> tuple:
+        """Same as the Experiment.key this task will produce."""
+        return (str(self.path.parent), self.path.name, self.algorithm.__name__,
+                getattr(self.local_strategy, 'name', None), self.k_max, self.t_max)
+
+
+def run_task(task: Task) -> results.Experiment:
+    """Worker process entry point."""
+    instance = bpp.BPInstance.from_reader(files.Instances.reader(task.path))
+    reduction = preprocessing.Reduction.of(instance) if task.preprocess else None
+    search_instance = reduction.reduced if reduction else instance
+
+    solution = approximation.best_solution(search_instance)
+    explorer = optimization.BPSolutionExplorer(search_instance, solution)
+    alg = task.algorithm(explorer, task.k_max, task.t_max, task.local_strategy,
+                         counters=instrumentation.SearchStats())
+    alg.solve()
+
+    if reduction:   # Report the solution of the whole instance
+        alg.explorer = optimization.BPSolutionExplorer(instance,
+                                                       reduction.expand(alg.explorer.solution))
+    return results.Experiment.from_algorithm(alg, reduction)
+
+
+@logs.append_logger
+class Scheduler:
+    """Every task is submitted on its own, largest instances first,
+    so a few slow instances at the end do not leave most workers idle.
+    """
+
+    def __init__(self, workers: int = None, silent: bool = True) -> None:
+        self.workers = workers or os.cpu_count()
+        self.silent = silent    # No logging inside workers, see logs.silence
+
+    def run(self, tasks: Iterable[Task]) -> Iterator[results.Experiment]:
+        """Yields experiments as they finish, logging progress and ETA."""
+        tasks = sorted(tasks, key=lambda task: task.items, reverse=True)
+        timer = utils.Timer()
+        timer.start()
+
+        initializer = logs.silence if self.silent else None
+        with concurrent.futures.ProcessPoolExecutor(self.workers,
+                                                    initializer=initializer) as executor:
+            futures = [executor.submit(run_task, task) for task in tasks]
+            for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+                yield future.result()
+
+                elapsed = timer.elapsed_time
+                eta = elapsed / done * (len(tasks) - done)
+                self.logger.info(f"{done}/{len(tasks)} tasks ({done/len(tasks):.0%}) "
+                                 f"elapsed={elapsed:.0f}s ETA={eta:.0f}s")
@@ -1,14 +1,9 @@
 import time
-import contextlib
-import errno
-import os
-import signal
-from math import ceil
+import threading
+from typing import Callable
 
 import logs
 
-DEFAULT_TIMEOUT_MESSAGE = os.strerror(errno.ETIME)
-
 
 @logs.append_logger
 class Timer:
@@ -36,26 +31,38 @@ class Timer:
         self._update()
         return self._elapsed_time
 
-    @contextlib.contextmanager
-    def timeout(self, seconds, *,
-                suppress_timeout_errors=True):
-        """ Inspired by https://gist.github.com/TySkby/143190ad1b88c6115597c45f996b030c """
-        self.start()
 
-        def _timeout_handler(signum, frame):
-            raise TimeoutError(DEFAULT_TIMEOUT_MESSAGE)
+class Deadline:
+    """Cooperative time budget, replaces interrupting the search with SIGALRM.
+    Long running code polls `expired` at safe points, where stopping leaves a consistent state.
+    Uses a monotonic clock, so budgets are not rounded to whole seconds, and holds no
+    signal handler, so it can be created, checked and cancelled from any thread.
+    `stopped`, if given, is polled too: it expires the budget early from outside,
+    like another process finding the optimum.
+    """
+    time = time.perf_counter
+
+    def __init__(self, seconds: float, stopped: Callable[[], bool] = None) -> None:
+        self.end_time = self.time() + seconds
+        self.stopped = stopped
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        """Expire now."""
+        self._cancelled.set()
 
-        signal.signal(signal.SIGALRM, _timeout_handler)
-        remaining = seconds-self.elapsed_time
-        signal.alarm(ceil(remaining))
+    @property
+    def remaining(self) -> float:
+        return max(0.0, self.end_time - self.time())
+
+    @property
+    def expired(self) -> bool:
+        return (self._cancelled.is_set() or self.time() >= self.end_time or
+                (self.stopped is not None and self.stopped()))
 
-        try:
-            yield
-        except TimeoutError as exc:
-            if not suppress_timeout_errors:
-                raise exc
-        finally:
-            signal.alarm(0)
+    def __deepcopy__(self, memo):
+        """Copies of an explorer keep sharing the same budget."""
+        return self
 
 
 def ask_yes_or_no(question):
@@ -72,8 +79,8 @@ def ask_continue():
 
 if __name__ == "__main__":
     t = Timer()
-    with t.timeout(2):
-        print("start")
-        time.sleep(3)
-        print("end")
-    print("finally")
+    t.start()
+    deadline = Deadline(0.25)
+    while not deadline.expired:
+        time.sleep(0.001)
+    print(f"{t.elapsed_time=:.4f}")
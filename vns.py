@@ -2,21 +2,32 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from enum import Enum, auto
+import time
 
+import instrumentation
 import utils
 import logs
 
 
 @logs.append_logger
 class NeighbourhoodExplorer(ABC):
+    # Set by VNS, checked at safe points inside shake and improve
+    deadline: utils.Deadline = None
+
+    # Set by VNS when instrumented, updated inside shake and improve
+    counters: instrumentation.SearchStats = None
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and self.deadline.expired
 
     @abstractmethod
     def shake(self, k: int) -> NeighbourhoodExplorer:
         """Returns a random kth neighbour."""
 
     @abstractmethod
-    def improve(self, strategy: LocalSearchStrategy) -> NeighbourhoodExplorer:
-        """Improve from current neighbour."""
+    def improve(self, strategy: LocalSearchStrategy, k: int = 1) -> NeighbourhoodExplorer:
+        """Improve from current neighbour, with the neighbourhoods of level k."""
 
     @property
     @abstractmethod
@@ -33,11 +44,44 @@ class NeighbourhoodExplorer(ABC):
     def stats(self):
         """Returns a string with usefull information about the current solution."""
 
+    @abstractmethod
+    def copy(self) -> NeighbourhoodExplorer:
+        """Independent copy."""
+
+    def commit(self) -> None:
+        """Keep this neighbour. Explorers that shake and improve in place override it."""
+
+    def rollback(self) -> None:
+        """Discard this neighbour. Explorers that shake and improve in place override it."""
+
+
+class Incumbent(ABC):
+    """Best solution shared by several VNS running at the same time."""
+
+    @abstractmethod
+    def publish(self, explorer: NeighbourhoodExplorer) -> None:
+        """Offer explorer as the new best, kept only if it is better."""
+
+    @abstractmethod
+    def adopt(self, explorer: NeighbourhoodExplorer) -> NeighbourhoodExplorer:
+        """Returns the shared best if it is better than explorer, else explorer itself."""
+
+    @abstractmethod
+    def stop(self) -> None:
+        """Ask every VNS sharing the incumbent to stop."""
+
+    @property
+    @abstractmethod
+    def stopped(self) -> bool:
+        """If any VNS asked to stop."""
+
 
 class LocalSearchStrategy(Enum):
     """Enum for selecting the strategy for local search."""
     FIRST = auto()
     BEST = auto()
+    FIRST_CIRCULAR = auto()     # FIRST resuming from the last improvement
+    FIRST_RANDOM = auto()       # FIRST_CIRCULAR over bins in random order
 
     def __repr__(self) -> str:
         return self.name
@@ -52,31 +96,59 @@ class VNS(ABC):
 
     local_strategy: LocalSearchStrategy = None
 
+    # Shared with other VNS running in parallel, see portfolio module
+    incumbent: Incumbent = field(default=None, repr=False)
+
+    # Optional instrumentation, pass a SearchStats to collect counters
+    counters: instrumentation.SearchStats = field(default=None, repr=False)
+
     # To keep track of current neighbourhood
     k: int = field(default=1, init=False, repr=False)
     timer: utils.Timer = field(default_factory=utils.Timer, init=False, repr=False)
+    deadline: utils.Deadline = field(default=None, init=False, repr=False)
 
     def solve(self) -> NeighbourhoodExplorer:
-        # TODO: improve timeout with context manager maybe?
         self.timer.start()
+        # Another search stopping the incumbent interrupts this one at its next safe point
+        stopped = (lambda: self.incumbent.stopped) if self.incumbent is not None else None
+        self.deadline = utils.Deadline(self.t_max, stopped)
+
+        # Neighbours may be explored in place, keep the given explorer untouched
+        self.explorer = self.explorer.copy()
+        self.explorer.deadline = self.deadline
+        self.explorer.counters = self.counters
 
         # self.logger.info(f"{self.__class__.__name__}({getattr(self,'strategy','')})\t"
         #                  f"{self.explorer.stats}")
         self.logger.info(self)
         self.logger.info(f"{self.explorer.stats}")
 
-        stop = False
+        # Nothing to search when starting at the optimum, as when preprocessing fixed every item
+        stop = self.explorer.is_optimum
         while not stop:
             self.k = 1
             while self.k <= self.k_max:
-                self.logger.debug(f"Neighbourhood = {self.k}")
+                if logs.DEBUG:
+                    self.logger.debug(f"Neighbourhood = {self.k}")
 
-                with self.timer.timeout(self.t_max):
-                    self.do_steps()     # The algorithm core
+                if self.counters is None:
+                    self.do_steps()     # The algorithm core, stops early if deadline expires
+                else:
+                    start = time.perf_counter()
+                    k = self.k
+                    self.do_steps()
+                    self.counters.add_step(k, time.perf_counter() - start)
 
                 if self.explorer.is_optimum:
                     stop = True
                     self.logger.success("Global optimum found.")
+                    if self.incumbent is not None:
+                        self.incumbent.stop()
+                    break
+
+                if self.incumbent is not None and self.incumbent.stopped:
+                    stop = True
+                    self.logger.info("Stopped by another search.")
                     break
 
                 if self.timed_out:
@@ -85,8 +157,16 @@ class VNS(ABC):
                     break
 
             else:   # If the inner loop wasn't broken
-                self.logger.info("Restart neighbourhood search")
-                self.logger.debug(f"{self.timer.elapsed_time}")
+                if logs.INFO:
+                    self.logger.info("Restart neighbourhood search")
+                if logs.DEBUG:
+                    self.logger.debug(f"{self.timer.elapsed_time}")
+                if self.counters is not None:
+                    self.counters.restarts += 1
+                if self.incumbent is not None:
+                    self.explorer = self.incumbent.adopt(self.explorer)
+                    self.explorer.deadline = self.deadline
+                    self.explorer.counters = self.counters
 
         self.logger.success(f"{self.__class__.__name__}"
                             f"({getattr(self,'strategy','')})\t"
@@ -105,17 +185,24 @@ class VNS(ABC):
 
     @property
     def timed_out(self) -> bool:
-        return self.timer.elapsed_time >= self.t_max
+        return self.deadline.expired
 
     def neighbourhood_change_sequential(self, new_explorer: NeighbourhoodExplorer) -> None:
         """Reused in many algorithms."""
         if new_explorer.fitness > self.explorer.fitness:
+            new_explorer.commit()
             self.explorer = new_explorer
-            self.logger.debug(self.explorer.stats)
+            if self.counters is not None:
+                self.counters.accepted += 1
+            if logs.DEBUG:
+                self.logger.debug(self.explorer.stats)
+            if self.incumbent is not None:
+                self.incumbent.publish(self.explorer)
             # plot(self.explorer.solution)
 
             self.k = 1
         else:
+            new_explorer.rollback()
             self.k += 1
 
 
@@ -123,7 +210,7 @@ class BasicVNS(VNS):
 
     def do_steps(self):
         neighbour = self.explorer.shake(self.k)
-        local_optimum = neighbour.improve(self.local_strategy)
+        local_optimum = neighbour.improve(self.local_strategy, self.k)
         self.neighbourhood_change_sequential(local_optimum)
 
 